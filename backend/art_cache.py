@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import io
+import os
+import logging
+import re
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from PIL import Image
+
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each variant; 'turntable' is the now-playing artwork
+ART_SIZES = {
+    'small': int(os.environ.get('ART_SIZE_SMALL', '96')),
+    'medium': int(os.environ.get('ART_SIZE_MEDIUM', '300')),
+    'turntable': int(os.environ.get('ART_SIZE_TURNTABLE', '640')),
+}
+ART_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+STALE_TMP_SECONDS = 3600
+
+
+class ArtCache:
+    """Resized album art and presenter photos served from a local disk cache.
+
+    An image is addressed by the hash of its origin URL (Spotify image ids
+    and Strapi upload names are content hashes themselves, so a URL never
+    changes content). On first request the origin image is fetched once and
+    every size in ART_SIZES is rendered to `<dir>/<hash[:2]>/<hash>-<size>.jpg`;
+    files are evicted least-recently-served first (by mtime, so workers
+    sharing the directory share one LRU) once it exceeds `max_bytes`.
+    Hash -> origin URL mappings live in memory and in the `art_sources`
+    collection so every worker can serve any hash.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.public_url = os.environ.get('ART_PUBLIC_URL', '').rstrip('/')
+        self.directory = Path(os.environ.get('ART_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'trucksim-art')))
+        self.max_bytes = int(os.environ.get('ART_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+        self.max_source_bytes = int(os.environ.get('ART_MAX_SOURCE_BYTES', str(10 * 1024 * 1024)))
+        self.quality = int(os.environ.get('ART_JPEG_QUALITY', '85'))
+        self.sources: Dict[str, str] = {}
+        # Directory size as of the last eviction pass
+        self.total_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._writes: Set[asyncio.Task] = set()
+        # 'hit' | 'fetch' | 'error' -> count
+        self.stats: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        """Payload URLs are only rewritten once the public base URL is configured"""
+        return bool(self.public_url)
+
+    @staticmethod
+    def make_hash(source: str) -> str:
+        return hashlib.sha256(source.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def valid_hash(art_hash: str) -> bool:
+        return bool(HASH_PATTERN.match(art_hash))
+
+    def url(self, source: str, size: str) -> str:
+        """Public /api/art URL for `source` at `size`, registering the source on first use"""
+        art_hash = self.make_hash(source)
+        if art_hash not in self.sources:
+            self.sources[art_hash] = source
+            task = asyncio.create_task(self._save_source(art_hash, source))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+        return f'{self.public_url}/api/art/{art_hash}?size={size}'
+
+    async def _save_source(self, art_hash: str, source: str):
+        try:
+            await self.collection.update_one(
+                {'_id': art_hash}, {'$setOnInsert': {'url': source}}, upsert=True
+            )
+        except Exception as e:
+            logger.error(f'Saving art source {art_hash} failed: {e}')
+
+    async def source_for(self, art_hash: str) -> Optional[str]:
+        source = self.sources.get(art_hash)
+        if source is None:
+            doc = await self.collection.find_one({'_id': art_hash})
+            if doc is not None:
+                source = self.sources[art_hash] = doc['url']
+        return source
+
+    def _path(self, art_hash: str, size: str) -> Path:
+        return self.directory / art_hash[:2] / f'{art_hash}-{size}.jpg'
+
+    # --- Disk LRU ---------------------------------------------------------
+    # The directory itself is the index, so every worker sharing ART_CACHE_DIR
+    # sees the same files: serving bumps a file's mtime and eviction deletes
+    # the oldest mtimes first, across the whole directory.
+
+    def _touch(self, path: Path) -> bool:
+        """Mark a cached file as just served; False if it is not (or no longer) on disk"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _evict_sync(self, keep: Set[Path]) -> int:
+        """Delete least-recently-served files until the directory fits max_bytes; returns its size"""
+        now = time.time()
+        files = []
+        for path in self.directory.glob('*/*'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.suffix == '.tmp':
+                # Left behind by a worker that died mid-write
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+
+        total = sum(size for _, _, size in files)
+        for _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+        return total
+
+    async def evict(self, keep: Set[Path] = frozenset()):
+        self.total_bytes = await asyncio.to_thread(self._evict_sync, set(keep))
+
+    async def load(self):
+        """Measure what is already on disk and enforce the size limit"""
+        await self.evict()
+
+    # --- Rendering --------------------------------------------------------
+
+    def _render(self, art_hash: str, data: bytes) -> List[Tuple[Path, int]]:
+        """Decode once, write every size variant atomically; returns (path, bytes) per file"""
+        image = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder downscale while decoding when the source is huge
+        image.draft('RGB', (max(ART_SIZES.values()),) * 2)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # JPEG has no alpha: flatten transparent photos onto white
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, 'white')
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            image = image.convert('RGB')
+
+        written = []
+        self._path(art_hash, 'small').parent.mkdir(parents=True, exist_ok=True)
+        for size, pixels in ART_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((pixels, pixels), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+
+            path = self._path(art_hash, size)
+            # A unique temp name: another worker may be rendering the same image
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(buffer.getvalue())
+                os.replace(tmp, path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            written.append((path, buffer.tell()))
+        return written
+
+    async def _materialize(self, art_hash: str) -> bool:
+        source = await self.source_for(art_hash)
+        if source is None:
+            return False
+
+        response = await http_client.get(source, timeout=10)
+        response.raise_for_status()
+        if len(response.content) > self.max_source_bytes:
+            raise ValueError(f'Image at {source} is larger than {self.max_source_bytes} bytes')
+
+        written = await asyncio.to_thread(self._render, art_hash, response.content)
+        await self.evict(keep={path for path, _ in written})
+        self.stats['fetch'] += 1
+        logger.info(f'Cached art {art_hash} from {source}')
+        return True
+
+    async def get(self, art_hash: str, size: str) -> Optional[Path]:
+        """Path of the cached variant, fetching and rendering it first if needed (None = unknown hash)"""
+        path = self._path(art_hash, size)
+        if self._touch(path):
+            self.stats['hit'] += 1
+            return path
+
+        task = self._inflight.get(art_hash)
+        if task is None:
+            task = asyncio.create_task(self._materialize(art_hash))
+            self._inflight[art_hash] = task
+
+            def done(t: asyncio.Task):
+                self._inflight.pop(art_hash, None)
+                # Retrieve the error even if every waiter was cancelled
+                if not t.cancelled():
+                    t.exception()
+            task.add_done_callback(done)
+        try:
+            # Shielded: one client going away must not cancel the others' download
+            if not await asyncio.shield(task):
+                return None
+        except Exception:
+            self.stats['error'] += 1
+            raise
+        return path
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import logging
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger(__name__)
+
+
+class MongoConnection:
+    """Motor client built on first use instead of at import time.
+
+    Building the client starts pymongo's monitor threads (and resolves SRV
+    records for mongodb+srv URLs), so deferring it keeps imports and worker
+    start-up fast. Collections handed out before that are lazy proxies.
+    """
+
+    def __init__(self):
+        self.url = os.environ['MONGO_URL']
+        self.db_name = os.environ['DB_NAME']
+        # Fail fast instead of blocking requests for pymongo's default 30 s
+        self.timeout_ms = int(os.environ.get('MONGO_TIMEOUT_MS', '5000'))
+        self._client: Optional[AsyncIOMotorClient] = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            if self.url.startswith('mongomock://'):
+                # In-process stand-in for the benchmark and tests (needs mongomock-motor)
+                from mongomock_motor import AsyncMongoMockClient
+                self._client = AsyncMongoMockClient()
+            else:
+                self._client = AsyncIOMotorClient(self.url, serverSelectionTimeoutMS=self.timeout_ms)
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    async def ping(self, timeout: float = 2.0):
+        """Raise if MongoDB does not answer a ping within `timeout` seconds"""
+        await asyncio.wait_for(self.client.admin.command('ping'), timeout=timeout)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class LazyDatabase:
+    """Stands in for a Motor database; attribute access returns lazy collections"""
+
+    def __init__(self, connection: MongoConnection):
+        self._connection = connection
+
+    def __getattr__(self, name: str) -> 'LazyCollection':
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return LazyCollection(self._connection, name)
+
+    def __getitem__(self, name: str) -> 'LazyCollection':
+        return LazyCollection(self._connection, name)
+
+
+class LazyCollection:
+    """Resolves to the real Motor collection on first attribute access"""
+
+    def __init__(self, connection: MongoConnection, name: str):
+        self._connection = connection
+        self.name = name
+
+    def __getattr__(self, attr: str):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._connection.db[self.name], attr)
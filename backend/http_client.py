@@ -0,0 +1,98 @@
+import asyncio
+import os
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from metrics import UPSTREAM_ERRORS, UPSTREAM_REQUEST_DURATION, UPSTREAM_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClient:
+    """App-lifetime async HTTP client shared by every upstream call.
+
+    Wraps a single pooled httpx.AsyncClient (keep-alive, HTTP/2 when the
+    upstream negotiates it) and caps concurrent requests per host so one
+    slow origin cannot take every pooled connection.
+    """
+
+    def __init__(self):
+        self.timeout = float(os.environ.get('UPSTREAM_TIMEOUT', '10'))
+        self.max_connections = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', '200'))
+        self.max_keepalive = int(os.environ.get('UPSTREAM_MAX_KEEPALIVE', '50'))
+        self.max_per_host = int(os.environ.get('UPSTREAM_MAX_PER_HOST', '20'))
+        self.http2 = os.environ.get('UPSTREAM_HTTP2', '1') not in ('0', 'false', 'False')
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning('h2 not installed, falling back to HTTP/1.1 for upstream calls')
+                http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+            ),
+            headers={'User-Agent': 'TruckSimFM-App/1.0'},
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    def _limit_for(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_per_host)
+            self._host_limits[host] = limit
+        return limit
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = httpx.URL(url).host
+        async with self._limit_for(host):
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                UPSTREAM_ERRORS.inc(host=host, error=type(e).__name__)
+                UPSTREAM_REQUESTS.inc(host=host, method=method, status='error')
+                raise
+            finally:
+                UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - started, host=host, method=method)
+
+        UPSTREAM_REQUESTS.inc(host=host, method=method, status=response.status_code)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(host=host, error=f'http_{response.status_code}')
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('PUT', url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
+
+
+# Create a singleton instance
+http_client = UpstreamClient()
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import logging
+import re
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OnTitle = Callable[[str], Awaitable[None]]
+
+STREAM_TITLE = re.compile(r"StreamTitle='(.*?)';(?=\w+=|$)", re.DOTALL)
+
+
+class IcyUnsupported(Exception):
+    """The stream did not offer in-band metadata (no icy-metaint header)"""
+
+
+def parse_stream_title(block: bytes) -> Optional[str]:
+    """Extract StreamTitle from one metadata block (NUL-padded to a multiple of 16 bytes)"""
+    raw = block.rstrip(b'\0')
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    match = STREAM_TITLE.search(text)
+    return match.group(1).strip() if match else None
+
+
+class IcyMetadataParser:
+    """Incremental splitter for an ICY stream: `metaint` audio bytes, then one
+    length byte (x16) and that many metadata bytes, repeated.
+
+    Audio bytes are only counted, never kept; only metadata is buffered.
+    """
+
+    def __init__(self, metaint: int):
+        self.metaint = metaint
+        self._audio_left = metaint
+        self._meta_left: Optional[int] = None  # None = expecting the length byte
+        self._meta = bytearray()
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Consume a chunk of the stream; returns the non-empty metadata blocks it completed"""
+        blocks = []
+        pos = 0
+        size = len(chunk)
+        while pos < size:
+            if self._audio_left:
+                skip = min(self._audio_left, size - pos)
+                self._audio_left -= skip
+                pos += skip
+            elif self._meta_left is None:
+                self._meta_left = chunk[pos] * 16
+                pos += 1
+                if self._meta_left == 0:
+                    self._meta_left = None
+                    self._audio_left = self.metaint
+            else:
+                take = min(self._meta_left, size - pos)
+                self._meta += chunk[pos:pos + take]
+                self._meta_left -= take
+                pos += take
+                if self._meta_left == 0:
+                    blocks.append(bytes(self._meta))
+                    self._meta.clear()
+                    self._meta_left = None
+                    self._audio_left = self.metaint
+        return blocks
+
+
+class IcyListener:
+    """Song-change detection from the radio stream's in-band ICY metadata.
+
+    Holds one connection to the stream with `Icy-MetaData: 1`, discards the
+    audio and calls `on_title` the moment StreamTitle changes. Reconnects
+    with exponential backoff; while disconnected (`connected` is False)
+    callers fall back to polling /currentsong.
+    """
+
+    def __init__(self, url: str, on_title: OnTitle):
+        self.url = url
+        self.on_title = on_title
+        self.enabled = os.environ.get('ICY_ENABLED', '1') not in ('0', 'false', 'False')
+        self.read_timeout = float(os.environ.get('ICY_READ_TIMEOUT', '30'))
+        self.retry_min = float(os.environ.get('ICY_RETRY_MIN', '1'))
+        self.retry_max = float(os.environ.get('ICY_RETRY_MAX', '60'))
+        self.title: Optional[str] = None
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _listen(self, client: httpx.AsyncClient):
+        async with client.stream('GET', self.url, headers={'Icy-MetaData': '1'}) as response:
+            response.raise_for_status()
+            metaint = response.headers.get('icy-metaint')
+            if not metaint or not metaint.isdigit() or int(metaint) <= 0:
+                raise IcyUnsupported(f'No icy-metaint header from {self.url}')
+
+            parser = IcyMetadataParser(int(metaint))
+            self.connected = True
+            logger.info(f'Listening for ICY metadata on {self.url} (metaint {metaint})')
+            async for chunk in response.aiter_raw():
+                for block in parser.feed(chunk):
+                    title = parse_stream_title(block)
+                    if title and title != self.title:
+                        self.title = title
+                        logger.info(f'ICY title changed: {title}')
+                        try:
+                            await self.on_title(title)
+                        except Exception as e:
+                            logger.error(f'ICY title handler failed: {e}')
+
+    async def _run(self):
+        delay = self.retry_min
+        timeout = httpx.Timeout(10, read=self.read_timeout)
+        # A dedicated HTTP/1.1 client: the stream would pin a pooled connection forever
+        async with httpx.AsyncClient(timeout=timeout, headers={'User-Agent': 'TruckSimFM-App/1.0'}) as client:
+            while True:
+                try:
+                    await self._listen(client)
+                    logger.warning('ICY stream ended, reconnecting')
+                except IcyUnsupported as e:
+                    logger.warning(f'{e}; polling /currentsong instead')
+                    delay = self.retry_max
+                except Exception as e:
+                    logger.warning(f'ICY stream error: {str(e) or type(e).__name__}')
+                if self.connected:
+                    # The stream worked for a while: reconnect quickly
+                    delay = self.retry_min
+                    self.connected = False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import logging
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+Hook = Callable[[], Awaitable[None]]
+
+
+class LeaderElection:
+    """MongoDB lease-based leader election across workers and nodes.
+
+    Every worker periodically tries to take or renew a lease document
+    (`_id` = election name). Whoever holds an unexpired lease is the
+    leader and runs `on_elected`; losing the lease runs `on_demoted`.
+    A leader that cannot reach MongoDB keeps leading until its own lease
+    would have expired, so a short blip does not stop the refresh loops.
+    Lease expiry is compared against each worker's wall clock, so keep
+    node clocks roughly in sync (well within the lease length).
+
+    With LEADER_ELECTION=0 the worker always leads (single-process setups).
+    """
+
+    def __init__(self, collection, name: str, on_elected: Hook, on_demoted: Hook):
+        self.collection = collection
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.enabled = os.environ.get('LEADER_ELECTION', '1') not in ('0', 'false', 'False')
+        self.lease = float(os.environ.get('LEADER_LEASE_SECONDS', '15'))
+        self.renew_interval = self.lease / 3
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self._lease_deadline = 0.0  # time.monotonic() when our last renewal runs out
+        self._task: Optional[asyncio.Task] = None
+
+    async def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if we hold it"""
+        now = datetime.utcnow()
+        renewed = time.monotonic()
+        try:
+            doc = await self.collection.find_one_and_update(
+                {'_id': self.name, '$or': [
+                    {'holder': self.worker_id},
+                    {'expires_at': {'$lt': now}},
+                ]},
+                {'$set': {
+                    'holder': self.worker_id,
+                    'expires_at': now + timedelta(seconds=self.lease),
+                    'renewed_at': now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease
+            return False
+        if doc is None or doc.get('holder') != self.worker_id:
+            return False
+        self._lease_deadline = renewed + self.lease
+        return True
+
+    async def _set_leader(self, leading: bool):
+        if leading == self.is_leader:
+            return
+        self.is_leader = leading
+        if leading:
+            logger.info(f'Worker {self.worker_id} is now the {self.name} leader')
+            await self.on_elected()
+        else:
+            logger.info(f'Worker {self.worker_id} is no longer the {self.name} leader')
+            await self.on_demoted()
+
+    async def _run(self):
+        if not self.enabled:
+            await self._set_leader(True)
+            return
+        while True:
+            try:
+                leading = await self.try_acquire()
+            except Exception as e:
+                logger.error(f'Leader election for {self.name} failed: {e}')
+                leading = self.is_leader and time.monotonic() < self._lease_deadline
+            try:
+                await self._set_leader(leading)
+            except Exception as e:
+                logger.error(f'Leader hook for {self.name} failed: {e}')
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop campaigning; a leader releases the lease so another worker takes over at once"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if not self.is_leader:
+            return
+        await self._set_leader(False)
+        if self.enabled:
+            try:
+                await self.collection.delete_one({'_id': self.name, 'holder': self.worker_id})
+            except Exception as e:
+                logger.error(f'Failed to release the {self.name} lease: {e}')
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# (document_id) -> current upstream like count
+ReadLikes = Callable[[str], Awaitable[int]]
+# (document_id, new like count) -> None
+WriteLikes = Callable[[str, int], Awaitable[None]]
+
+
+class LikeAggregator:
+    """Write-behind like counter.
+
+    Likes are recorded with an atomic $inc in MongoDB (`song_likes`), with
+    optional per-device dedup (`song_like_devices`, expiring after
+    `device_ttl` seconds), and the optimistic total is returned straight
+    away. A periodic flusher pushes each
+    document's accumulated delta upstream as one read-modify-write,
+    so a burst of N likes costs one upstream write per flush interval.
+    The upstream count a new song starts from is read in the background,
+    once per document, so recording never waits on upstream; until it is
+    known the count is reported as unknown rather than guessed.
+    """
+
+    def __init__(self, db, read_likes: ReadLikes, write_likes: WriteLikes):
+        self.likes = db.song_likes
+        self.devices = db.song_like_devices
+        self.read_likes = read_likes
+        self.write_likes = write_likes
+        self.flush_interval = float(os.environ.get('LIKES_FLUSH_INTERVAL', '10'))
+        # A document whose flush failed is skipped for this long so it can't block the others
+        self.retry_delay = float(os.environ.get('LIKES_RETRY_DELAY', '60'))
+        self.max_known = int(os.environ.get('LIKES_KNOWN_SIZE', '1000'))
+        # Per-device dedup records are kept this long, well past any song's time in the app
+        self.device_ttl = int(os.environ.get('LIKES_DEVICE_TTL', str(30 * 24 * 3600)))
+        self.claim_timeout = 60
+        # Last optimistic count seen by this worker, used to patch cached lists (bounded LRU)
+        self.known: "OrderedDict[str, int]" = OrderedDict()
+        self._base_reads: Dict[str, asyncio.Task] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.likes.create_index('document_id', unique=True)
+        await self.likes.create_index('pending')
+        await self.devices.create_index([('document_id', 1), ('device_id', 1)], unique=True)
+        try:
+            await self.devices.create_index('liked_at', expireAfterSeconds=self.device_ttl)
+        except OperationFailure:
+            # The TTL index already exists with another expiry; update it in place
+            await self.devices.database.command(
+                'collMod', self.devices.name,
+                index={'keyPattern': {'liked_at': 1}, 'expireAfterSeconds': self.device_ttl}
+            )
+
+    async def _read_base(self, document_id: str):
+        try:
+            base = await self.read_likes(document_id)
+        except Exception as e:
+            # Until a read or a flush succeeds the song's count is reported as unknown
+            logger.warning(f"Could not read upstream likes for {document_id}: {e}")
+            return
+        # Only if no flush has set a newer base in the meantime
+        doc = await self.likes.find_one_and_update(
+            {'document_id': document_id, 'base': {'$exists': False}},
+            {'$set': {'base': base}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is not None:
+            self._remember(document_id, base + doc.get('pending', 0))
+
+    def _fetch_base(self, document_id: str):
+        """Read the upstream count this song started from, in the background (one read per document)"""
+        if document_id in self._base_reads:
+            return
+        task = asyncio.create_task(self._read_base(document_id))
+        self._base_reads[document_id] = task
+
+        def done(t: asyncio.Task):
+            self._base_reads.pop(document_id, None)
+            if not t.cancelled() and t.exception() is not None:
+                logger.error(f"Reading the like base for {document_id} failed: {t.exception()}")
+        task.add_done_callback(done)
+
+    def _remember(self, document_id: str, count: int):
+        self.known[document_id] = count
+        self.known.move_to_end(document_id)
+        while len(self.known) > self.max_known:
+            self.known.popitem(last=False)
+
+    async def record(self, document_id: str, device_id: Optional[str] = None) -> Tuple[Optional[int], bool]:
+        """Record a like; returns (optimistic like count, whether this like counted)
+
+        The count is None while the song's upstream count is still unknown
+        (its first like on this deployment); it is read in the background.
+        """
+        counted = True
+        if device_id:
+            try:
+                await self.devices.insert_one({
+                    'document_id': document_id,
+                    'device_id': device_id,
+                    'liked_at': datetime.utcnow(),
+                })
+            except DuplicateKeyError:
+                counted = False
+
+        if counted:
+            doc = await self.likes.find_one_and_update(
+                {'document_id': document_id},
+                {'$inc': {'pending': 1}, '$set': {'updated_at': datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            doc = await self.likes.find_one({'document_id': document_id}) or {}
+
+        base = doc.get('base')
+        if base is None:
+            self._fetch_base(document_id)
+            return None, counted
+        count = base + doc.get('pending', 0)
+        self._remember(document_id, count)
+        return count, counted
+
+    def overlay(self, document_id: Optional[str], likes: int) -> int:
+        """Patch a (possibly cached) upstream like count with likes not yet flushed"""
+        return max(likes or 0, self.known.get(document_id, 0))
+
+    async def flush(self):
+        """Push every pending delta upstream"""
+        while True:
+            now = datetime.utcnow()
+            # Claim one document so concurrent flushers (other workers) skip it
+            doc = await self.likes.find_one_and_update(
+                {'pending': {'$gt': 0}, '$or': [
+                    {'claimed_until': {'$exists': False}},
+                    {'claimed_until': {'$lt': now}},
+                ]},
+                {'$set': {'claimed_until': now + timedelta(seconds=self.claim_timeout)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                return
+
+            document_id = doc['document_id']
+            delta = doc['pending']
+            try:
+                current = await self.read_likes(document_id)
+                new_likes = current + delta
+                await self.write_likes(document_id, new_likes)
+            except Exception as e:
+                logger.error(f"Error flushing {delta} likes for {document_id}, retrying in {self.retry_delay:.0f}s: {e}")
+                # Keep it claimed for a while so the other documents still get flushed
+                await self.likes.update_one(
+                    {'_id': doc['_id']},
+                    {'$set': {'claimed_until': now + timedelta(seconds=self.retry_delay)}}
+                )
+                continue
+
+            # Likes recorded during the upstream write stay pending for the next flush
+            await self.likes.update_one(
+                {'_id': doc['_id']},
+                {'$inc': {'pending': -delta}, '$set': {'base': new_likes}, '$unset': {'claimed_until': ''}}
+            )
+            logger.info(f"Flushed {delta} likes for {document_id}: {current} -> {new_likes}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Like flush failed: {e}")
+
+    def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flusher and push whatever is still pending"""
+        for task in list(self._base_reads.values()):
+            task.cancel()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final like flush failed: {e}")
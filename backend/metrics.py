@@ -0,0 +1,243 @@
+import asyncio
+import bisect
+import os
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0]
+            self._series[key] = series
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names + ('le',), key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Callback(Metric):
+    """A value read from elsewhere at scrape time.
+
+    `read` returns a number, or a list of (labels dict, number) pairs.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, read: Callable[[], Any],
+                 labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self.read = read
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.error(f'Failed to read metric {self.name}: {e}')
+            return []
+        if isinstance(value, (int, float)):
+            value = [({}, value)]
+        return [
+            f'{self.name}{_format_labels(self.label_names, self._key(labels))} {_format_value(number)}'
+            for labels, number in value
+        ]
+
+
+class Registry:
+    """Hand-rolled Prometheus registry, rendered in the text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, read: Callable[[], Any],
+                 labels: Tuple[str, ...] = ()) -> Callback:
+        return self.register(Callback(name, documentation, kind, read, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template.
+
+    Latency is measured until the response headers are sent, so long-lived
+    streams (SSE) count their time to first byte. Requests that match no
+    route share the label "unmatched" to keep cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status: int):
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope['method'],
+                route=getattr(route, 'path', 'unmatched'),
+                status=status,
+            )
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                record(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            record(500)
+            raise
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag: how late a periodic wake-up actually runs"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or float(os.environ.get('LOOP_LAG_INTERVAL', '0.5'))
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(time.perf_counter() - started - self.interval, 0))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Create a singleton instance
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time to response headers per route', ('method', 'route', 'status'))
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    'upstream_request_duration_seconds', 'Upstream call latency per host', ('host', 'method'))
+UPSTREAM_REQUESTS = registry.counter(
+    'upstream_requests_total', 'Upstream calls per host and response status', ('host', 'method', 'status'))
+UPSTREAM_ERRORS = registry.counter(
+    'upstream_errors_total', 'Failed upstream calls (transport errors and 5xx) per host', ('host', 'error'))
+SPOTIFY_SEARCH_ATTEMPTS = registry.counter(
+    'spotify_search_attempts_total', 'Spotify search queries issued per fallback strategy', ('strategy', 'name'))
+SPOTIFY_SEARCH_MATCHES = registry.counter(
+    'spotify_search_matches_total', 'Track lookups resolved per fallback strategy ("none" = not found)',
+    ('strategy', 'name'))
+EVENT_LOOP_LAG = registry.histogram(
+    'event_loop_lag_seconds', 'Delay of periodic event-loop wake-ups past their deadline', buckets=LOOP_LAG_BUCKETS)
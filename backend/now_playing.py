@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Source = Callable[[], Awaitable[Any]]
+
+
+class NowPlayingBroadcaster:
+    """Shared upstream watcher that fans now-playing changes out to subscribers.
+
+    One watcher task polls each source on its own interval and publishes an
+    event only when a source's value actually changes. The watcher runs only
+    while at least one client is subscribed, so idle workers cost nothing and
+    connected clients share the same upstream polling.
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._sources: List[Tuple[str, Source, float]] = []
+        self._state: Dict[str, Any] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def add_source(self, event: str, source: Source, interval: float):
+        self._sources.append((event, source, interval))
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self._state)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Prime new subscribers with whatever the watcher already knows
+        for event, data in self._state.items():
+            queue.put_nowait({"type": event, "data": data})
+        self._subscribers.add(queue)
+        self._ensure_watcher()
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers:
+                await self.stop()
+
+    def publish(self, event: str, data: Any):
+        message = {"type": event, "data": data}
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the watcher
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def poke(self, *events: str):
+        """Re-poll these sources now instead of at their next interval"""
+        if self._watcher is None or self._watcher.done():
+            return
+        sources = [(event, source) for event, source, _ in self._sources if event in events]
+        for event, source in sources:
+            asyncio.create_task(self._poll(event, source))
+
+    def _ensure_watcher(self):
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _poll(self, event: str, source: Source):
+        try:
+            data = await source()
+        except Exception as e:
+            logger.error(f'Now-playing source "{event}" failed: {e}')
+            return
+        if self._state.get(event) != data:
+            self._state[event] = data
+            self.publish(event, data)
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        next_due = {event: 0.0 for event, _, _ in self._sources}
+        tick = min((interval for _, _, interval in self._sources), default=1.0)
+        logger.info('Now-playing watcher started')
+        try:
+            while True:
+                now = loop.time()
+                due = [(event, source, interval) for event, source, interval in self._sources
+                       if next_due[event] <= now]
+                for event, _, interval in due:
+                    next_due[event] = now + interval
+                await asyncio.gather(*(self._poll(event, source) for event, source, _ in due))
+                await asyncio.sleep(tick)
+        finally:
+            logger.info('Now-playing watcher stopped')
+
+
+async def next_message(queue: asyncio.Queue, heartbeat_interval: float) -> Dict[str, Any]:
+    """Wait for the next event, or produce a heartbeat if the channel is quiet"""
+    try:
+        return await asyncio.wait_for(queue.get(), timeout=heartbeat_interval)
+    except asyncio.TimeoutError:
+        return {"type": "heartbeat", "data": {"ts": datetime.utcnow().isoformat()}}
+
+
+def format_sse(message: Dict[str, Any]) -> str:
+    """Encode a broadcaster message as a Server-Sent Event"""
+    return f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
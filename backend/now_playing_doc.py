@@ -0,0 +1,70 @@
+import asyncio
+import os
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from song_parser import parse_now_playing
+
+logger = logging.getLogger(__name__)
+
+# (artist, title) -> (status, track) as returned by SpotifyService.search_many
+Enrich = Callable[[str, str], Awaitable[Tuple[str, Optional[Dict[str, Any]]]]]
+
+
+class NowPlayingDocument:
+    """The parsed and Spotify-enriched now-playing document, built once per song.
+
+    `on_song` is fed every fetched now-playing string and starts a rebuild
+    only when it changes, so reads are a memory lookup. A document whose
+    enrichment failed (Spotify erroring or circuit open) is rebuilt on a
+    read after `retry_interval` seconds; a plain "not on Spotify" is kept.
+    """
+
+    def __init__(self, enrich: Enrich):
+        self.enrich = enrich
+        self.retry_interval = float(os.environ.get('NOW_PLAYING_RETRY_INTERVAL', '15'))
+        self.song: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._built_at = 0.0
+
+    def on_song(self, song: str):
+        if song != self.song:
+            self.song = song
+            self._rebuild()
+
+    def _rebuild(self):
+        self._task = asyncio.create_task(self._build(self.song))
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def _needs_retry(self) -> bool:
+        if not self._task.done():
+            return False
+        if self._task.cancelled() or self._task.exception() is not None:
+            return True
+        incomplete = self._task.result()['spotify_status'] in ('error', 'unavailable')
+        return incomplete and time.monotonic() - self._built_at > self.retry_interval
+
+    async def get(self, song: str) -> Dict[str, Any]:
+        self.on_song(song)
+        if self._needs_retry():
+            self._rebuild()
+        return await asyncio.shield(self._task)
+
+    async def _build(self, song: str) -> Dict[str, Any]:
+        parsed = parse_now_playing(song)
+        status, track = 'skipped', None
+        if parsed['parsed']:
+            status, track = await self.enrich(parsed['artist'], parsed['title'])
+
+        self._built_at = time.monotonic()
+        logger.info(f"Built now-playing document for {song} (spotify: {status})")
+        return {
+            "raw": song,
+            "artist": parsed['artist'],
+            "title": parsed['title'],
+            "spotify": track,
+            "spotify_status": status,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
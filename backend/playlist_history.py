@@ -0,0 +1,109 @@
+import asyncio
+import os
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+from schedule_index import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# (limit, start) -> formatted playlist items, newest first
+FetchPage = Callable[[int, int], Awaitable[List[Dict[str, Any]]]]
+# Called with the entries each ingestion found for the first time
+OnNew = Callable[[List[Dict[str, Any]]], Any]
+
+
+class PlaylistHistory:
+    """Local copy of the station's playlist, read with keyset pagination.
+
+    An ingestion loop upserts the newest upstream entries (by `id`) into
+    the `playlist_history` collection; reads never touch upstream.
+    """
+
+    def __init__(self, collection, fetch_page: FetchPage, on_new: Optional[OnNew] = None):
+        self.collection = collection
+        self.fetch_page = fetch_page
+        self.on_new = on_new
+        self.interval = float(os.environ.get('PLAYLIST_INGEST_INTERVAL', '15'))
+        self.page_size = int(os.environ.get('PLAYLIST_INGEST_PAGE', '25'))
+        self.backfill_pages = int(os.environ.get('PLAYLIST_BACKFILL_PAGES', '4'))
+        self.latest_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.collection.create_index('id', unique=True)
+        await self.collection.create_index([('played_datetime', DESCENDING)])
+
+    async def store(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Upsert items; returns the ones newer than anything seen before"""
+        items = [item for item in items if item.get('id') is not None]
+        if not items:
+            return []
+
+        await self.collection.bulk_write([
+            UpdateOne(
+                {'id': item['id']},
+                # played_datetime is stored parsed so it can be range-queried and indexed
+                {'$set': {**item, 'played_datetime': parse_datetime(item.get('played_at'))}},
+                upsert=True
+            )
+            for item in items
+        ], ordered=False)
+
+        new_items = [item for item in items if self.latest_id is None or item['id'] > self.latest_id]
+        self.latest_id = max([self.latest_id or 0] + [item['id'] for item in items])
+        return new_items
+
+    async def ingest(self) -> List[Dict[str, Any]]:
+        items = await self.fetch_page(self.page_size, 0)
+        new_items = await self.store(items)
+        if new_items:
+            logger.info(f"Ingested {len(new_items)} new playlist entries")
+            if self.on_new is not None:
+                self.on_new(new_items)
+        return new_items
+
+    async def backfill(self):
+        """Pull a few older pages so history scrolling has depth after a cold start"""
+        for page in range(1, self.backfill_pages):
+            items = await self.fetch_page(self.page_size, page * self.page_size)
+            if not items:
+                break
+            await self.store(items)
+
+    async def page(self, limit: int, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Newest-first page of entries with id < before; returns (items, next cursor)"""
+        query = {'id': {'$lt': before}} if before is not None else {}
+        docs = await self.collection.find(
+            query, {'_id': 0, 'played_datetime': 0}
+        ).sort('id', DESCENDING).limit(limit).to_list(limit)
+        next_cursor = docs[-1]['id'] if len(docs) == limit else None
+        return docs, next_cursor
+
+    async def _run(self):
+        try:
+            await self.ingest()
+            await self.backfill()
+        except Exception as e:
+            logger.error(f"Initial playlist ingestion failed: {e}")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.ingest()
+            except Exception as e:
+                logger.error(f"Playlist ingestion failed: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import os
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from track_cache import TrackCache
+
+logger = logging.getLogger(__name__)
+
+# [(artist, title)] -> [(status, track)] as returned by SpotifyService.search_many
+Resolve = Callable[[List[Tuple[str, str]]], Awaitable[List[Tuple[str, Optional[dict]]]]]
+
+# Lower runs first: the song on air beats playlist ingestion beats warm-up
+PRIORITY_NOW_PLAYING = 0
+PRIORITY_PLAYLIST = 1
+PRIORITY_WARM = 2
+
+
+class SpotifyPrefetcher:
+    """Resolves Spotify metadata before any client asks for it.
+
+    Tracks are queued on song change, as new playlist entries are ingested
+    and from the recently-played list when a worker becomes leader, then
+    resolved by a fixed number of workers into the track cache. The queue
+    is bounded (submissions beyond `max_queued` are dropped, the client
+    path still resolves them lazily) and deduplicated on the track cache
+    key, so a track already waiting or in flight is not queued twice.
+    """
+
+    def __init__(self, resolve: Resolve):
+        self.resolve = resolve
+        self.enabled = os.environ.get('SPOTIFY_PREFETCH', '1') not in ('0', 'false', 'False')
+        self.concurrency = int(os.environ.get('SPOTIFY_PREFETCH_CONCURRENCY', '2'))
+        self.max_queued = int(os.environ.get('SPOTIFY_PREFETCH_QUEUE', '200'))
+        self._queue: "asyncio.PriorityQueue" = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._pending: Dict[str, int] = {}
+        self._order = itertools.count()
+        self._workers: List[asyncio.Task] = []
+        self._warm_task: Optional[asyncio.Task] = None
+        # 'found' | 'not_found' | 'error' | 'unavailable' | 'deduplicated' | 'dropped' -> count
+        self.stats: Counter = Counter()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, artist: str, title: str, priority: int = PRIORITY_PLAYLIST) -> bool:
+        """Queue a track for resolution; returns False if it was a duplicate or the queue is full"""
+        if not self.enabled or not artist or not title:
+            return False
+        key = TrackCache.make_key(artist, title)
+        if key in self._pending:
+            self.stats['deduplicated'] += 1
+            return False
+        try:
+            self._queue.put_nowait((priority, next(self._order), key, artist, title))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += 1
+            logger.warning(f'Prefetch queue full, dropping {artist} - {title}')
+            return False
+        self._pending[key] = priority
+        return True
+
+    def submit_many(self, pairs: Iterable[Tuple[str, str]], priority: int = PRIORITY_PLAYLIST) -> int:
+        return sum(self.submit(artist, title, priority) for artist, title in pairs)
+
+    async def _work(self):
+        while True:
+            _, _, key, artist, title = await self._queue.get()
+            try:
+                (status, _), = await self.resolve([(artist, title)])
+                self.stats[status] += 1
+            except Exception as e:
+                self.stats['error'] += 1
+                logger.error(f'Prefetch failed for {artist} - {title}: {e}')
+            finally:
+                self._pending.pop(key, None)
+                self._queue.task_done()
+
+    def warm(self, source: Callable[[], Awaitable[List[Tuple[str, str]]]]):
+        """Queue the tracks `source` returns at warm-up priority, in the background"""
+        async def run():
+            try:
+                queued = self.submit_many(await source(), PRIORITY_WARM)
+                logger.info(f'Queued {queued} tracks for Spotify prefetch warm-up')
+            except Exception as e:
+                logger.error(f'Prefetch warm-up failed: {e}')
+
+        if self.enabled:
+            self._warm_task = asyncio.create_task(run())
+
+    def start(self):
+        if self.enabled and not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        tasks = self._workers + ([self._warm_task] if self._warm_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._warm_task = None
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+AUTO_DJ_PRESENTER = {
+    "name": "DJ Cruise Control",
+    "show_name": "Auto DJ",
+    "description": "Full throttle tunes...",
+    "photo_url": "https://trucksim.fm/uploads/DJ_Cruise_Control_62185ad8f6.png",
+    "is_auto_dj": True
+}
+
+
+def is_auto_dj_name(username: str) -> bool:
+    name = username.lower()
+    return 'cruise' in name or 'auto' in name
+
+
+class PresenterResolver:
+    """Holds the live presenter in memory and recomputes it on song change.
+
+    The presenter is derived from the latest playlist entry's `played_by`
+    (who is actually on air), enriched with the schedule's current slot.
+    If the playlist has no presenter or cannot be fetched, the schedule
+    slot is used, and the auto-DJ when nothing is scheduled.
+    """
+
+    def __init__(self,
+                 fetch_latest_play: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+                 current_slot: Callable[[], Awaitable[Optional[Dict[str, Any]]]]):
+        self.fetch_latest_play = fetch_latest_play
+        self.current_slot = current_slot
+        self.song: Optional[str] = None
+        self.current: Optional[Dict[str, Any]] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    def on_song(self, song: str):
+        """Called with every fetched now-playing title; recomputes only when it changes"""
+        if song != self.song:
+            self.song = song
+            self.refresh()
+
+    def refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._recompute_until_clean())
+        else:
+            # A change arrived mid-recompute; run once more when it finishes
+            self._dirty = True
+        return self._inflight
+
+    async def _recompute_until_clean(self):
+        while True:
+            self._dirty = False
+            await self._recompute()
+            if not self._dirty:
+                return
+
+    async def get(self) -> Dict[str, Any]:
+        if self.current is None:
+            if self._inflight is None or self._inflight.done():
+                self.refresh()
+            await asyncio.shield(self._inflight)
+        return self.current or AUTO_DJ_PRESENTER
+
+    async def _recompute(self):
+        play = None
+        try:
+            play = await self.fetch_latest_play()
+        except Exception as e:
+            logger.error(f"Error fetching latest playlist entry: {e}")
+
+        slot = None
+        try:
+            slot = await self.current_slot()
+        except Exception as e:
+            logger.error(f"Error reading schedule slot: {e}")
+
+        self.current = self.resolve(play, slot)
+        logger.info(f"Live presenter resolved: {self.current['name']}")
+
+    @staticmethod
+    def resolve(play: Optional[Dict[str, Any]], slot: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        played_by = play.get('played_by') if play else None
+
+        if played_by and isinstance(played_by, dict) and played_by.get('username'):
+            username = played_by['username']
+            photo = played_by.get('profile_photo')
+            photo_url = None
+            if photo and isinstance(photo, dict) and photo.get('url'):
+                photo_url = f"https://trucksim.fm{photo['url']}"
+
+            # Borrow show details when the scheduled slot belongs to the same presenter
+            same_show = slot and (slot.get('presenter') or '').lower() == username.lower()
+            return {
+                "name": username,
+                "show_name": slot['show_name'] if same_show else f"Live with {username}",
+                "description": slot['description'] if same_show else "",
+                "photo_url": photo_url or (slot.get('photo_url') if same_show else None),
+                "is_auto_dj": is_auto_dj_name(username)
+            }
+
+        if slot and slot.get('presenter'):
+            logger.info("Falling back to schedule-based presenter detection")
+            return {
+                "name": slot['presenter'],
+                "show_name": slot['show_name'],
+                "description": slot['description'],
+                "photo_url": slot.get('photo_url'),
+                "is_auto_dj": is_auto_dj_name(slot['presenter'])
+            }
+
+        return AUTO_DJ_PRESENTER
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """The limiter could not grant a request within the allowed wait"""
+
+
+class CircuitOpen(Exception):
+    """The circuit breaker is open; the call was not attempted"""
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP-date)"""
+    if not value:
+        return default
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Client-side token-bucket rate limiter that also honours Retry-After pauses.
+
+    Each caller reserves the next token up front (the balance goes negative
+    while callers are queued), so its wait covers everyone queued ahead of
+    it and a caller that would wait longer than `max_wait` is rejected at
+    once instead of queueing behind others.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        # No tokens accrue during a pause
+        since = max(self.updated_at, self.paused_until)
+        if now > since:
+            self.tokens = min(self.capacity, self.tokens + (now - since) * self.rate)
+        self.updated_at = max(self.updated_at, now)
+
+    def pause(self, seconds: float):
+        """Stop granting tokens for `seconds` (e.g. from a Retry-After header)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.paused_until = max(self.paused_until, now + seconds)
+        # Keep existing reservations (negative balance), drop the spare tokens
+        self.tokens = min(self.tokens, 0)
+
+    def _wait_for_next(self, now: float) -> float:
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            wait += (1 - self.tokens) / self.rate
+        return wait
+
+    async def acquire(self, max_wait: float):
+        """Take one token, waiting at most `max_wait` seconds; raise RateLimited otherwise"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = self._wait_for_next(now)
+        if wait > max_wait:
+            raise RateLimited(f'rate limited for another {wait:.1f}s')
+        self.tokens -= 1
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Give the reservation back to the callers behind us
+                self.tokens += 1
+                raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'tokens': round(max(self.tokens, 0.0), 2),
+            'queued': max(math.ceil(-self.tokens), 0),
+            'paused_for': round(max(self.paused_until - time.monotonic(), 0.0), 2),
+        }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open after `reset_timeout` seconds, letting one trial call
+    through; the trial's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, name: str = 'circuit'):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Give back an allowed call that never completed (e.g. it was cancelled)"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f'{self.name} circuit closed')
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.warning(f'{self.name} circuit opened after {self.failures} failures')
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        retry_in = 0.0
+        if state == 'open':
+            retry_in = self.reset_timeout - (time.monotonic() - self.opened_at)
+        return {
+            'state': state,
+            'consecutive_failures': self.failures,
+            'retry_in': round(retry_in, 2),
+        }
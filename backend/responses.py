@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str, separators=(',', ':')).encode()
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q-value}"""
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+class ConditionalJSON:
+    """JSON responses with ETag/If-None-Match support and cached compression.
+
+    The ETag is a hash of the serialized body, so an unchanged upstream
+    payload yields the same tag and clients revalidating get a bodiless
+    304; each content coding gets its own tag ("<hash>-gzip"), since the
+    bytes differ. Compressed variants are kept per hash, so each payload
+    version is compressed once no matter how many clients download it.
+    Pass `memo` (see UpstreamCache.memo) to also serialize and hash a
+    cached payload only once instead of on every request.
+    """
+
+    def __init__(self, max_variants: int = 64):
+        self.max_variants = max_variants
+        self._variants: "OrderedDict[str, Dict[str, bytes]]" = OrderedDict()
+
+    def _encoded(self, digest: str, body: bytes, encoding: str) -> bytes:
+        variants = self._variants.get(digest)
+        if variants is None:
+            variants = {}
+            self._variants[digest] = variants
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+        self._variants.move_to_end(digest)
+
+        if encoding not in variants:
+            if encoding == 'br':
+                variants[encoding] = brotli.compress(body, quality=5)
+            else:
+                variants[encoding] = gzip.compress(body, compresslevel=6)
+        return variants[encoding]
+
+    @staticmethod
+    def _pick_encoding(request: Request) -> str:
+        """The most preferred coding we support, by the client's q-values (ties: br, then gzip)"""
+        qualities = accepted_encodings(request.headers.get('accept-encoding', ''))
+        best, best_quality = 'identity', 0.0
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    @staticmethod
+    def encode(payload: Any) -> Tuple[bytes, str]:
+        """Serialized body and its content hash"""
+        body = dumps(payload)
+        return body, hashlib.blake2b(body, digest_size=12).hexdigest()
+
+    def render(self, request: Request, payload: Any, memo: Optional[Dict[str, Any]] = None) -> Response:
+        encoded = memo.get('json') if memo is not None else None
+        if encoded is None:
+            encoded = self.encode(payload)
+            if memo is not None:
+                memo['json'] = encoded
+        body, digest = encoded
+
+        encoding = self._pick_encoding(request)
+        if len(body) < MIN_COMPRESS_SIZE:
+            encoding = 'identity'
+        etag = f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+        headers = {
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+            # Clients may keep the body but must revalidate (cheaply) each time
+            'Cache-Control': 'no-cache',
+        }
+
+        if_none_match = request.headers.get('if-none-match', '')
+        if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+
+        if encoding != 'identity':
+            body = self._encoded(digest, body, encoding)
+            headers['Content-Encoding'] = encoding
+
+        return Response(content=body, media_type='application/json', headers=headers)
+
+
+# Create a singleton instance
+conditional_json = ConditionalJSON()
@@ -0,0 +1,267 @@
+import bisect
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Version of the compact schedule item schema served by /api/schedule?format=compact
+SCHEDULE_SCHEMA_VERSION = 1
+COMPACT_FIELDS = (
+    'id', 'show_name', 'description', 'start_time', 'end_time', 'permanent',
+    'perm_end', 'excluded_dates', 'presenter', 'photo_url',
+)
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Strapi ISO timestamp into an aware UTC datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    parsed = parse_datetime(value)
+    if parsed is not None:
+        return parsed.date()
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def format_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat().replace('+00:00', 'Z') if value else None
+
+
+def minute_of_week(moment: datetime) -> int:
+    """Minutes since Monday 00:00 UTC"""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+class Show:
+    """One schedule entry with its times parsed once at build time"""
+
+    def __init__(self, item: Dict[str, Any]):
+        self.item = item
+        self.show_name = (item.get('show_name') or '').strip()
+        self.description = item.get('description') or ''
+        self.permanent = bool(item.get('permanent'))
+        self.start = parse_datetime(item.get('start_time'))
+        self.end = parse_datetime(item.get('end_time'))
+        self.perm_end = parse_datetime(item.get('perm_end'))
+        self.excluded_dates = {
+            d for d in (parse_date(x) for x in item.get('excluded_dates') or []) if d
+        }
+
+        user = item.get('users_permissions_user') or {}
+        self.presenter = user.get('username') if isinstance(user, dict) else None
+        photo = user.get('profile_photo') if isinstance(user, dict) else None
+        self.photo_url = None
+        if photo and isinstance(photo, dict) and photo.get('url'):
+            self.photo_url = f"https://trucksim.fm{photo['url']}"
+
+    @property
+    def valid(self) -> bool:
+        return self.start is not None and self.end is not None
+
+    @property
+    def duration(self) -> int:
+        """Length in minutes; a show whose end time-of-day is before its start runs past midnight"""
+        start = self.start.hour * 60 + self.start.minute
+        end = self.end.hour * 60 + self.end.minute
+        if self.permanent:
+            return (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+        return max(int((self.end - self.start).total_seconds() // 60), 0)
+
+    def runs_on(self, occurrence_start: datetime) -> bool:
+        """Whether a permanent show's weekly occurrence starting at this time actually airs"""
+        if self.perm_end is not None and self.perm_end < occurrence_start:
+            return False
+        return occurrence_start.date() not in self.excluded_dates
+
+    def occurrence(self, start: datetime) -> Dict[str, Any]:
+        end = start + timedelta(minutes=self.duration)
+        return {
+            'show_name': self.show_name or (f'Live with {self.presenter}' if self.presenter else ''),
+            'description': self.description,
+            'start_time': format_datetime(start),
+            'end_time': format_datetime(end),
+            'permanent': self.permanent,
+            'presenter': self.presenter,
+            'photo_url': self.photo_url,
+        }
+
+    def compact(self) -> Dict[str, Any]:
+        """The show in the compact schema: flat, with parsed and normalized values"""
+        return {
+            'id': self.item.get('id'),
+            'show_name': self.show_name,
+            'description': self.description,
+            'start_time': format_datetime(self.start),
+            'end_time': format_datetime(self.end),
+            'permanent': self.permanent,
+            'perm_end': format_datetime(self.perm_end),
+            'excluded_dates': sorted(d.isoformat() for d in self.excluded_dates),
+            'presenter': self.presenter,
+            'photo_url': self.photo_url,
+        }
+
+    def priority(self) -> Tuple[int, int, int]:
+        # Same order as the app: one-time shows first, then named shows, then earliest end
+        end = self.end.hour * 60 + self.end.minute
+        return (1 if self.permanent else 0, 0 if self.show_name else 1, end)
+
+
+class IntervalIndex:
+    """Static interval stabbing index.
+
+    The axis is cut at every interval boundary and each segment stores the
+    intervals covering it, so a lookup is one bisect.
+    """
+
+    def __init__(self, intervals: List[Tuple[float, float, Any]]):
+        points = sorted({p for start, end, _ in intervals for p in (start, end)})
+        self.bounds = points
+        self.active: List[List[Any]] = []
+        for i, left in enumerate(points):
+            right = points[i + 1] if i + 1 < len(points) else None
+            self.active.append([
+                value for start, end, value in intervals
+                if start <= left and right is not None and end >= right
+            ])
+
+    def at(self, point: float) -> List[Any]:
+        i = bisect.bisect_right(self.bounds, point) - 1
+        if i < 0:
+            return []
+        return self.active[i]
+
+
+class ScheduleIndex:
+    """Precomputed lookups over the station schedule.
+
+    Permanent (weekly) shows are indexed on a minute-of-week axis, one-time
+    shows on absolute time. Rebuilt whenever the schedule is re-fetched.
+    """
+
+    def __init__(self, items: Optional[List[Dict[str, Any]]] = None):
+        self.rebuild(items or [])
+
+    def rebuild(self, items: List[Dict[str, Any]]):
+        shows = [Show(item) for item in items]
+        shows = [show for show in shows if show.valid]
+
+        weekly: List[Tuple[float, float, Tuple[Show, int]]] = []
+        one_time: List[Tuple[float, float, Tuple[Show, int]]] = []
+        for show in shows:
+            if show.permanent:
+                start = minute_of_week(show.start)
+                end = start + show.duration
+                # `offset` maps a segment back to the occurrence's real start
+                weekly.append((start, min(end, MINUTES_PER_WEEK), (show, 0)))
+                if end > MINUTES_PER_WEEK:
+                    weekly.append((0, end - MINUTES_PER_WEEK, (show, MINUTES_PER_WEEK)))
+            else:
+                one_time.append((show.start.timestamp(), show.end.timestamp(), (show, 0)))
+
+        self.shows = shows
+        self.compact = [show.compact() for show in shows]
+        self._projections: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        self.weekly = IntervalIndex([(s, e - 1e-6, v) for s, e, v in weekly])
+        self.one_time = IntervalIndex([(s, e - 1e-6, v) for s, e, v in one_time])
+
+        self.weekly_starts = sorted(
+            (minute_of_week(show.start), i) for i, show in enumerate(shows) if show.permanent
+        )
+        self.one_time_starts = sorted(
+            (show.start.timestamp(), i) for i, show in enumerate(shows) if not show.permanent
+        )
+        logger.info(f'Built schedule index: {len(weekly)} weekly, {len(one_time)} one-time intervals')
+
+    def project(self, fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """Compact items restricted to `fields` (memoized until the next rebuild)"""
+        if not fields:
+            return self.compact
+        projection = self._projections.get(fields)
+        if projection is None:
+            projection = [{field: item[field] for field in fields} for item in self.compact]
+            if len(self._projections) >= 32:
+                self._projections.clear()
+            self._projections[fields] = projection
+        return projection
+
+    def live(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Shows on air at `now`, highest priority first"""
+        now = now or datetime.now(timezone.utc)
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        mow = minute_of_week(now) + now.second / 60
+
+        candidates = []
+        for show, offset in self.weekly.at(mow):
+            start = show.start.hour * 60 + show.start.minute
+            occurrence_start = week_start + timedelta(
+                minutes=show.start.weekday() * MINUTES_PER_DAY + start - offset
+            )
+            if show.runs_on(occurrence_start):
+                candidates.append((show, occurrence_start))
+        for show, _ in self.one_time.at(now.timestamp()):
+            candidates.append((show, show.start))
+
+        candidates.sort(key=lambda c: c[0].priority())
+        return [show.occurrence(start) for show, start in candidates]
+
+    def now(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """The presenter-led show on air right now, if any"""
+        for show in self.live(now):
+            if show['presenter']:
+                return show
+        return None
+
+    def upcoming(self, count: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """The next `count` show occurrences starting after `now`"""
+        now = now or datetime.now(timezone.utc)
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        results: List[Tuple[datetime, Show]] = []
+
+        # One-time shows: bisect to the first future start and read forward
+        i = bisect.bisect_right(self.one_time_starts, (now.timestamp(), len(self.shows)))
+        for _, idx in self.one_time_starts[i:i + count]:
+            results.append((self.shows[idx].start, self.shows[idx]))
+
+        # Weekly shows: walk the minute-of-week ring from now, for up to two
+        # weeks so excluded occurrences can be skipped
+        if self.weekly_starts:
+            mow = minute_of_week(now) + now.second / 60
+            i = bisect.bisect_right(self.weekly_starts, (mow, len(self.shows)))
+            found = 0
+            n = len(self.weekly_starts)
+            for step in range(2 * n):
+                if found >= count:
+                    break
+                week, pos = divmod(i + step, n)
+                start_mow, idx = self.weekly_starts[pos]
+                show = self.shows[idx]
+                start = week_start + timedelta(weeks=week, minutes=start_mow)
+                if show.perm_end is not None and show.perm_end < start:
+                    continue
+                if start.date() in show.excluded_dates:
+                    continue
+                results.append((start, show))
+                found += 1
+
+        results.sort(key=lambda r: r[0])
+        return [show.occurrence(start) for start, show in results[:count]]
+
+
+# Create a singleton instance
+schedule_index = ScheduleIndex()
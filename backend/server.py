@@ -1,10 +1,13 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
 import re
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -16,21 +19,87 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Import SpotifyService AFTER loading environment variables
-from spotify_service import SpotifyService
+from spotify_service import spotify_service
+from spotify_token import token_manager
+from http_client import http_client
+from upstream_cache import upstream_cache
+from track_cache import TrackCache
+from track_catalogue import TrackCatalogue
+from schedule_index import COMPACT_FIELDS, SCHEDULE_SCHEMA_VERSION, schedule_index
+from presenter import PresenterResolver
+from now_playing_doc import NowPlayingDocument
+from song_parser import parse_now_playing
+from art_cache import ART_CACHE_CONTROL, ART_SIZES, ArtCache
+from likes import LikeAggregator
+from playlist_history import PlaylistHistory
+from prefetch import PRIORITY_NOW_PLAYING, PRIORITY_PLAYLIST, SpotifyPrefetcher
+from responses import conditional_json
+from status_store import StatusCheckStore
+from metrics import LoopLagMonitor, MetricsMiddleware, registry as metrics_registry
+from now_playing import NowPlayingBroadcaster, format_sse, next_message
+from icy_listener import IcyListener
+from database import LazyDatabase, MongoConnection
+from leader import LeaderElection
+from shared_cache import SharedCache
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection (the client is built on first use)
+mongo = MongoConnection()
+db = LazyDatabase(mongo)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Initialize Spotify service AFTER env vars are loaded
-spotify_service = SpotifyService()
+status_store = StatusCheckStore(db.status_checks)
+
+# With several workers, one (the leader, see leader_election) polls upstream
+# and publishes the results here for the others to read
+shared_cache = SharedCache(db.shared_cache, is_leader=lambda: leader_election.is_leader)
+token_manager.shared = shared_cache
+
+# Token requests fail fast on the same circuit as the API calls
+token_manager.breaker = spotify_service.breaker
+
+# Share the process-wide Spotify service and back it with the persistent track cache
+spotify_service.cache = TrackCache(db.spotify_tracks)
+# Fuzzy first tier: spelling variants of tracks resolved before never reach Spotify
+spotify_service.catalogue = TrackCatalogue(db.track_catalogue)
+
+# Resized artwork served from local disk; payload URLs point here once ART_PUBLIC_URL is set
+art_cache = ArtCache(db.art_sources)
+
+# Upstream services (overridable to point the server at local stand-ins)
+RADIO_BASE_URL = os.environ.get('RADIO_BASE_URL', 'https://radio.trucksim.fm:8000')
+STRAPI_BASE_URL = os.environ.get('STRAPI_BASE_URL', 'https://www.trucksim.fm')
+ICY_STREAM_URL = os.environ.get('ICY_STREAM_URL', f'{RADIO_BASE_URL}/radio.mp3')
+
+# Upstream cache policy (seconds): values are fresh for *_TTL, then served
+# stale for up to *_STALE_TTL while a single background refresh runs
+CURRENT_SONG_TTL = float(os.environ.get('CURRENT_SONG_TTL', '5'))
+CURRENT_SONG_STALE_TTL = float(os.environ.get('CURRENT_SONG_STALE_TTL', '30'))
+SCHEDULE_TTL = float(os.environ.get('SCHEDULE_TTL', '300'))
+SCHEDULE_STALE_TTL = float(os.environ.get('SCHEDULE_STALE_TTL', '3600'))
+RECENTLY_PLAYED_TTL = float(os.environ.get('RECENTLY_PLAYED_TTL', '15'))
+RECENTLY_PLAYED_STALE_TTL = float(os.environ.get('RECENTLY_PLAYED_STALE_TTL', '60'))
+MAX_RECENTLY_PLAYED = 50
+MAX_SCHEDULE_NEXT = 20
+# Serialized /api/schedule bodies kept per schedule version (raw, compact, field selections)
+MAX_SCHEDULE_SHAPES = 32
+SPOTIFY_BATCH_CONCURRENCY = int(os.environ.get('SPOTIFY_BATCH_CONCURRENCY', '4'))
+NOW_PLAYING_HEARTBEAT = float(os.environ.get('NOW_PLAYING_HEARTBEAT', '15'))
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT', '2'))
+WARMUP_RETRY_MIN = float(os.environ.get('WARMUP_RETRY_MIN', '2'))
+WARMUP_RETRY_MAX = float(os.environ.get('WARMUP_RETRY_MAX', '60'))
 
 
 # Define Models
@@ -57,6 +126,20 @@ class SpotifyTrackResponse(BaseModel):
     spotify_url: Optional[str] = None
     duration_ms: Optional[int] = None
     preview_url: Optional[str] = None
+    # True for stand-in metadata with placeholder art while Spotify is unavailable
+    placeholder: bool = False
+
+class SpotifyBatchSearchRequest(BaseModel):
+    items: List[SpotifySearchRequest] = Field(..., max_length=50)
+
+class SpotifyBatchSearchResult(BaseModel):
+    artist: str
+    title: str
+    status: str  # "found", "not_found", "error" or "unavailable"
+    track: Optional[SpotifyTrackResponse] = None
+
+class SpotifyBatchSearchResponse(BaseModel):
+    results: List[SpotifyBatchSearchResult]
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
@@ -75,32 +158,105 @@ async def app_root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness probe: the process is up (see /ready for dependencies)"""
     return {"status": "healthy", "service": "TruckSim FM API"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once MongoDB answers and warm-up has run once, 503 otherwise"""
+    dependencies = {}
+    try:
+        await mongo.ping(READY_PING_TIMEOUT)
+        dependencies["mongo"] = "ok"
+    except Exception as e:
+        dependencies["mongo"] = f"error: {str(e) or type(e).__name__}"
+    dependencies["spotify"] = "ok" if spotify_service.status()["available"] else "circuit open"
+    if leader_election.is_leader:
+        dependencies["icy_stream"] = "connected" if icy_listener.connected else "polling"
+
+    warm = {
+        "current_song": upstream_cache.peek('current-song') is not None,
+        "schedule": upstream_cache.peek('schedule') is not None,
+        # Only the leader ingests the playlist
+        "playlist_history": playlist_history.latest_id is not None if leader_election.is_leader else None,
+        "spotify_token": token_manager.is_valid,
+    }
+    # Warm caches are reported but not required: a third-party outage
+    # (trucksim.fm, Spotify) must not keep new workers out of rotation.
+    # The endpoints serve their fallbacks and warm-up keeps retrying.
+    ready = dependencies["mongo"] == "ok" and warmup_state["attempted"]
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "not_ready",
+            "role": "leader" if leader_election.is_leader else "follower",
+            "dependencies": dependencies,
+            "warm": warm,
+            "warmup": warmup_state,
+        },
+        status_code=200 if ready else 503
+    )
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await status_store.add(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks(skip: int = 0, limit: int = 100):
+async def get_status_checks(response: Response, skip: int = 0, limit: int = 100, before: Optional[str] = None):
+    """Newest status checks first. Pass the X-Next-Cursor header of one page as
+    `before` to get the next; `skip` is still accepted but scans the skipped rows."""
     # Limit max results to prevent performance issues
-    safe_limit = min(limit, 100)
-    status_checks = await db.status_checks.find(
-        {}, 
-        {"_id": 0}
-    ).sort("timestamp", -1).skip(skip).limit(safe_limit).to_list(None)
+    safe_limit = max(min(limit, 100), 1)
+    if skip and not before:
+        status_checks = await db.status_checks.find(
+            {},
+            {"_id": 0}
+        ).sort([("timestamp", -1), ("id", -1)]).skip(skip).limit(safe_limit).to_list(None)
+        return [StatusCheck(**status_check) for status_check in status_checks]
+
+    try:
+        status_checks, next_cursor = await status_store.page(safe_limit, before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+def _with_art(track: dict) -> dict:
+    """Track with its album art served through /api/art (one source image, three sizes)"""
+    source = track.get('album_art_url')
+    if not art_cache.enabled or not source:
+        return track
+    return {
+        **track,
+        'album_art_url': art_cache.url(source, 'turntable'),
+        'album_art_medium': art_cache.url(source, 'medium'),
+        'album_art_small': art_cache.url(source, 'small'),
+    }
+
+def _presenter_with_art(presenter: Optional[dict]) -> Optional[dict]:
+    """Presenter or show entry with its photo served through /api/art"""
+    if not art_cache.enabled or not presenter or not presenter.get('photo_url'):
+        return presenter
+    return {**presenter, 'photo_url': art_cache.url(presenter['photo_url'], 'medium')}
+
+def _track_or_placeholder(status: str, result: Optional[dict], artist: str, title: str) -> Optional[dict]:
+    """The resolved track, or placeholder art while the Spotify circuit is open"""
+    if result is None and status == 'unavailable':
+        return spotify_service.placeholder_track(artist, title)
+    return result
+
 @api_router.post("/spotify/search", response_model=SpotifyTrackResponse)
 async def search_spotify_track(request: SpotifySearchRequest):
     """Search for a track on Spotify and return metadata including album art"""
     try:
-        result = spotify_service.search_track(request.artist, request.title)
+        result = await spotify_service.search_track(request.artist, request.title)
+        if result is None and not spotify_service.status()['available']:
+            result = spotify_service.placeholder_track(request.artist, request.title)
         if result:
-            return SpotifyTrackResponse(**result)
+            return SpotifyTrackResponse(**_with_art(result))
         else:
             # Return empty response if no results found
             return SpotifyTrackResponse()
@@ -108,20 +264,70 @@ async def search_spotify_track(request: SpotifySearchRequest):
         logging.error(f"Error in Spotify search endpoint: {e}")
         raise HTTPException(status_code=500, detail="Failed to search Spotify")
 
-@api_router.get("/current-song")
-async def get_current_song():
-    """Proxy endpoint to fetch current song from TruckSimFM (avoids CORS issues)"""
-    import requests
+@api_router.get("/spotify/status")
+async def get_spotify_status():
+    """Spotify availability: while the circuit is open, searches return cached metadata or placeholder art"""
+    return spotify_service.status()
+
+@api_router.post("/spotify/search/batch", response_model=SpotifyBatchSearchResponse)
+async def search_spotify_tracks_batch(request: SpotifyBatchSearchRequest):
+    """Resolve many tracks in one call; results are returned in input order"""
+    pairs = [(item.artist, item.title) for item in request.items]
+    outcomes = await spotify_service.search_many(pairs, concurrency=SPOTIFY_BATCH_CONCURRENCY)
+    tracks = [
+        _track_or_placeholder(status, result, artist, title)
+        for (artist, title), (status, result) in zip(pairs, outcomes)
+    ]
+    return SpotifyBatchSearchResponse(results=[
+        SpotifyBatchSearchResult(
+            artist=artist,
+            title=title,
+            status=status,
+            track=SpotifyTrackResponse(**_with_art(track)) if track else None
+        )
+        for (artist, title), (status, _), track in zip(pairs, outcomes, tracks)
+    ])
+
+async def _request_current_song() -> str:
+    # While the ICY listener is connected it already has the title; no poll needed
+    if icy_listener.connected and icy_listener.title:
+        return icy_listener.title
+
+    response = await http_client.get(
+        f'{RADIO_BASE_URL}/currentsong?sid=1',
+        timeout=5
+    )
+    response.raise_for_status()
+    song_text = response.text.strip()
+
+    logger.info(f"Fetched current song: {song_text}")
+    return song_text
+
+def _on_song(song_text: str):
+    """Feed every fetched now-playing string to the per-song state; each acts only on a change"""
+    if song_text != now_playing_doc.song and leader_election.is_leader:
+        # Resolve the song on air ahead of everything queued; the document
+        # build below joins the same lookup instead of starting its own
+        parsed = parse_now_playing(song_text)
+        if parsed['parsed']:
+            spotify_prefetcher.submit(parsed['artist'], parsed['title'], PRIORITY_NOW_PLAYING)
+    presenter_resolver.on_song(song_text)
+    now_playing_doc.on_song(song_text)
+
+async def _fetch_current_song() -> str:
+    song_text = await shared_cache.get(
+        'current-song', _request_current_song, max_age=CURRENT_SONG_TTL + CURRENT_SONG_STALE_TTL
+    )
+    _on_song(song_text)
+    return song_text
+
+async def _current_song_payload():
     try:
-        response = requests.get(
-            'https://radio.trucksim.fm:8000/currentsong?sid=1',
-            timeout=5
+        song_text = await upstream_cache.get(
+            'current-song', _fetch_current_song,
+            ttl=CURRENT_SONG_TTL, stale_ttl=CURRENT_SONG_STALE_TTL
         )
-        response.raise_for_status()
-        song_text = response.text.strip()
-        
-        logger.info(f"Fetched current song: {song_text}")
-        
+
         return {
             "success": True,
             "data": song_text
@@ -133,97 +339,139 @@ async def get_current_song():
             "data": "TruckSimFM - Live Radio"
         }
 
+@api_router.get("/current-song")
+async def get_current_song(request: Request):
+    """Proxy endpoint to fetch current song from TruckSimFM (avoids CORS issues)"""
+    return conditional_json.render(request, await _current_song_payload())
+
+async def _request_latest_play() -> Optional[dict]:
+    response = await http_client.get(
+        f'{STRAPI_BASE_URL}/api/playlists?pagination[limit]=1&sort[0]=id:desc&populate=*',
+        timeout=10
+    )
+    response.raise_for_status()
+    items = response.json().get('data', [])
+    return items[0] if items else None
+
+async def _fetch_latest_play() -> Optional[dict]:
+    # Fetched on song change; a copy older than that belongs to the previous song
+    return await shared_cache.get('latest-play', _request_latest_play, max_age=2 * CURRENT_SONG_TTL)
+
+async def _current_schedule_slot() -> Optional[dict]:
+    await upstream_cache.get('schedule', _fetch_schedule, ttl=SCHEDULE_TTL, stale_ttl=SCHEDULE_STALE_TTL)
+    return schedule_index.now()
+
+# Recomputed only when the now-playing title changes (see _fetch_current_song)
+presenter_resolver = PresenterResolver(_fetch_latest_play, _current_schedule_slot)
+
+async def _live_presenter_payload():
+    try:
+        # Cheap cache hit; keeps song-change detection running even if no client polls current-song
+        await upstream_cache.get(
+            'current-song', _fetch_current_song,
+            ttl=CURRENT_SONG_TTL, stale_ttl=CURRENT_SONG_STALE_TTL
+        )
+    except Exception as e:
+        logger.error(f"Error checking current song for presenter: {e}")
+
+    return {
+        "success": True,
+        "data": _presenter_with_art(await presenter_resolver.get())
+    }
+
 @api_router.get("/live-presenter")
-async def get_live_presenter():
-    """Get the current live presenter by checking who played the most recent songs"""
-    import requests
+async def get_live_presenter(request: Request):
+    """Get the current live presenter (played_by of the latest song, enriched from the schedule)"""
+    return conditional_json.render(request, await _live_presenter_payload())
+
+async def _enrich_track(artist: str, title: str):
+    (status, track), = await spotify_service.search_many([(artist, title)])
+    return status, track
+
+# Rebuilt only when the now-playing title changes (see _fetch_current_song)
+now_playing_doc = NowPlayingDocument(_enrich_track)
+
+async def _now_playing_payload():
     try:
-        # Fetch recent playlists to see who's playing
-        response = requests.get(
-            'https://www.trucksim.fm/api/playlists?pagination[limit]=5&sort[0]=id:desc&populate=*',
-            timeout=10,
-            headers={
-                'User-Agent': 'TruckSimFM-App/1.0'
-            }
+        song_text = await upstream_cache.get(
+            'current-song', _fetch_current_song,
+            ttl=CURRENT_SONG_TTL, stale_ttl=CURRENT_SONG_STALE_TTL
+        )
+        document = await now_playing_doc.get(song_text)
+        track = _track_or_placeholder(
+            document["spotify_status"], document["spotify"], document["artist"], document["title"]
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            items = data.get('data', [])
-            
-            if items:
-                # Get the most recent played_by user
-                recent_item = items[0]
-                played_by = recent_item.get('played_by')
-                
-                if played_by and isinstance(played_by, dict):
-                    username = played_by.get('username', '')
-                    photo = played_by.get('profile_photo')
-                    photo_url = None
-                    if photo and isinstance(photo, dict):
-                        photo_url = f"https://trucksim.fm{photo.get('url', '')}"
-                    
-                    # Check if it's the auto-DJ
-                    is_auto_dj = 'cruise' in username.lower() or 'auto' in username.lower()
-                    
-                    logger.info(f"Live presenter from playlist: {username}")
-                    
-                    return {
-                        "success": True,
-                        "data": {
-                            "name": username,
-                            "show_name": f"Live with {username}",
-                            "description": "",
-                            "photo_url": photo_url,
-                            "is_auto_dj": is_auto_dj
-                        }
-                    }
-        
-        # Fallback: Try to get from schedule
-        logger.info("Falling back to schedule-based presenter detection")
-        
-        # Return auto-DJ as default
         return {
             "success": True,
             "data": {
-                "name": "DJ Cruise Control",
-                "show_name": "Auto DJ",
-                "description": "Full throttle tunes...",
-                "photo_url": "https://trucksim.fm/uploads/DJ_Cruise_Control_62185ad8f6.png",
-                "is_auto_dj": True
+                **document,
+                "spotify": _with_art(track) if track else None,
+                "presenter": _presenter_with_art(await presenter_resolver.get()),
             }
         }
     except Exception as e:
-        logger.error(f"Error getting live presenter: {e}")
+        logger.error(f"Error building now-playing document: {e}")
         return {
-            "success": True,
+            "success": False,
             "data": {
-                "name": "DJ Cruise Control",
-                "show_name": "Auto DJ",
-                "description": "Full throttle tunes...",
-                "photo_url": "https://trucksim.fm/uploads/DJ_Cruise_Control_62185ad8f6.png",
-                "is_auto_dj": True
+                "raw": None,
+                "artist": "Live Radio",
+                "title": "TruckSimFM",
+                "spotify": None,
+                "spotify_status": "skipped",
+                "presenter": _presenter_with_art(presenter_resolver.current),
             }
         }
 
-@api_router.get("/schedule")
-async def get_schedule():
-    """Proxy endpoint to fetch schedule from TruckSimFM (avoids CORS issues)"""
-    import requests
+@api_router.get("/now-playing")
+async def get_now_playing(request: Request):
+    """Current song parsed into artist/title, with its Spotify metadata and the live presenter
+
+    Replaces current-song + client-side parsing + spotify/search with one cached read.
+    """
+    return conditional_json.render(request, await _now_playing_payload())
+
+async def _request_schedule() -> list:
+    response = await http_client.get(
+        f'{STRAPI_BASE_URL}/api/schedules?populate=*',
+        timeout=10
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    items = data.get('data', [])
+    logger.info(f"Fetched {len(items)} schedule items")
+    return items
+
+async def _fetch_schedule() -> list:
+    items = await shared_cache.get('schedule', _request_schedule, max_age=SCHEDULE_TTL + SCHEDULE_STALE_TTL)
+    schedule_index.rebuild(items)
+    return items
+
+async def _schedule_payload(format: str = "raw", fields: Optional[str] = None):
     try:
-        response = requests.get(
-            'https://www.trucksim.fm/api/schedules?populate=*',
-            timeout=10
+        schedule = await upstream_cache.get(
+            'schedule', _fetch_schedule,
+            ttl=SCHEDULE_TTL, stale_ttl=SCHEDULE_STALE_TTL
         )
-        response.raise_for_status()
-        data = response.json()
-        
-        logger.info(f"Fetched {len(data.get('data', []))} schedule items")
-        
+
+        if format == "compact" or fields:
+            requested = tuple(f.strip() for f in (fields or "").split(",") if f.strip())
+            unknown = [f for f in requested if f not in COMPACT_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown schedule fields: {', '.join(unknown)}")
+            return {
+                "success": True,
+                "version": SCHEDULE_SCHEMA_VERSION,
+                "data": schedule_index.project(requested)
+            }
+
         return {
             "success": True,
-            "data": data.get('data', [])
+            "data": schedule
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching schedule: {e}")
         return {
@@ -232,39 +480,163 @@ async def get_schedule():
             "error": str(e)
         }
 
-@api_router.get("/recently-played")
-async def get_recently_played(limit: int = 5):
-    """Proxy endpoint to fetch recently played songs from TruckSimFM"""
-    import requests
+@api_router.get("/schedule")
+async def get_schedule(request: Request, format: str = "raw", fields: Optional[str] = None):
+    """Proxy endpoint to fetch schedule from TruckSimFM (avoids CORS issues)
+
+    format=compact returns the flat, versioned schema instead of the Strapi
+    object graph; fields=a,b,c additionally limits each item to those fields.
+    """
+    payload = await _schedule_payload(format, fields)
+    # Built from the current cache entry (nothing awaited since), so its body is
+    # serialized and hashed once per schedule version and shape
+    memo = None
+    schedule_memo = upstream_cache.memo('schedule')
+    if payload["success"] and schedule_memo is not None:
+        shape = f'compact:{fields or ""}' if format == "compact" or fields else 'raw'
+        if shape not in schedule_memo and len(schedule_memo) >= MAX_SCHEDULE_SHAPES:
+            schedule_memo.clear()
+        memo = schedule_memo.setdefault(shape, {})
+    return conditional_json.render(request, payload, memo)
+
+async def _schedule_now_payload():
     try:
-        # Fetch playlist data sorted by most recent first
-        # The API returns items sorted by ID desc which corresponds to most recent
-        response = requests.get(
-            f'https://www.trucksim.fm/api/playlists?pagination[limit]={limit}&pagination[start]=0&sort[0]=id:desc',
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        items = data.get('data', [])
-        logger.info(f"Fetched {len(items)} recently played items")
-        
-        # Format the response
-        formatted = []
-        for item in items:
-            formatted.append({
-                "id": item.get("id"),
-                "documentId": item.get("documentId"),
-                "artist": item.get("artist", "Unknown"),
-                "song": item.get("song", "Unknown"),
-                "artwork_url": item.get("artwork_url"),
-                "played_at": item.get("played_datetime"),
-                "likes": item.get("likes", 0),
-            })
-        
+        # Refreshes the index too when the cached schedule has expired
+        await upstream_cache.get('schedule', _fetch_schedule, ttl=SCHEDULE_TTL, stale_ttl=SCHEDULE_STALE_TTL)
+    except Exception as e:
+        logger.error(f"Error refreshing schedule: {e}")
+    return {
+        "success": True,
+        "data": _presenter_with_art(schedule_index.now())
+    }
+
+@api_router.get("/schedule/now")
+async def get_schedule_now(request: Request):
+    """The presenter-led show on air right now (null when the auto-DJ is on)"""
+    return conditional_json.render(request, await _schedule_now_payload())
+
+async def _schedule_next_payload(count: int = 3):
+    count = max(1, min(count, MAX_SCHEDULE_NEXT))
+    try:
+        await upstream_cache.get('schedule', _fetch_schedule, ttl=SCHEDULE_TTL, stale_ttl=SCHEDULE_STALE_TTL)
+    except Exception as e:
+        logger.error(f"Error refreshing schedule: {e}")
+    return {
+        "success": True,
+        "data": [_presenter_with_art(show) for show in schedule_index.upcoming(count)]
+    }
+
+@api_router.get("/schedule/next")
+async def get_schedule_next(request: Request, count: int = 3):
+    """The next `count` upcoming show occurrences"""
+    return conditional_json.render(request, await _schedule_next_payload(count))
+
+@api_router.get("/art/{art_hash}")
+async def get_art(art_hash: str, size: str = "turntable"):
+    """Album art or presenter photo resized to `size`, fetched from origin once and served from disk"""
+    if size not in ART_SIZES or not art_cache.valid_hash(art_hash):
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        path = await art_cache.get(art_hash, size)
+    except Exception as e:
+        logger.error(f"Error caching art {art_hash}: {e}")
+        source = art_cache.sources.get(art_hash)
+        if source is None:
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+        # Still show the artwork: send the client to the origin, without caching the detour
+        return RedirectResponse(source, headers={"Cache-Control": "no-store"})
+
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": ART_CACHE_CONTROL})
+
+async def _fetch_recently_played(limit: int, start: int = 0) -> list:
+    # Fetch playlist data sorted by most recent first
+    # The API returns items sorted by ID desc which corresponds to most recent
+    response = await http_client.get(
+        f'{STRAPI_BASE_URL}/api/playlists?pagination[limit]={limit}&pagination[start]={start}&sort[0]=id:desc',
+        timeout=10
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    items = data.get('data', [])
+    logger.info(f"Fetched {len(items)} recently played items")
+
+    # Format the response
+    formatted = []
+    for item in items:
+        formatted.append({
+            "id": item.get("id"),
+            "documentId": item.get("documentId"),
+            "artist": item.get("artist", "Unknown"),
+            "song": item.get("song", "Unknown"),
+            "artwork_url": item.get("artwork_url"),
+            "played_at": item.get("played_datetime"),
+            "likes": item.get("likes", 0),
+        })
+    return formatted
+
+async def _enrich_playlist_items(items: list) -> list:
+    # Copy the items: the un-enriched list is shared through upstream_cache
+    outcomes = await spotify_service.search_many(
+        [(item["artist"], item["song"]) for item in items],
+        concurrency=SPOTIFY_BATCH_CONCURRENCY
+    )
+    tracks = [
+        _track_or_placeholder(status, result, item["artist"], item["song"])
+        for item, (status, result) in zip(items, outcomes)
+    ]
+    return [
+        {**item, "spotify": SpotifyTrackResponse(**_with_art(track)).dict() if track else None}
+        for item, track in zip(items, tracks)
+    ]
+
+def _playlist_pairs(items: list) -> list:
+    return [(item["artist"], item["song"]) for item in items]
+
+# Resolves Spotify metadata into the track cache ahead of the clients (leader only):
+# the song on air as it changes, new playlist entries and the recent history
+spotify_prefetcher = SpotifyPrefetcher(spotify_service.search_many)
+
+# Local copy of the playlist, kept current by a background ingestion loop
+playlist_history = PlaylistHistory(
+    db.playlist_history, _fetch_recently_played,
+    on_new=lambda items: spotify_prefetcher.submit_many(_playlist_pairs(items), PRIORITY_PLAYLIST)
+)
+
+async def _recent_from_upstream(limit: int) -> list:
+    return await upstream_cache.get(
+        f'recently-played:{limit}', lambda: _fetch_recently_played(limit),
+        ttl=RECENTLY_PLAYED_TTL, stale_ttl=RECENTLY_PLAYED_STALE_TTL
+    )
+
+async def _recently_played_payload(limit: int = 5, before: Optional[int] = None, enrich: bool = False):
+    limit = max(1, min(limit, MAX_RECENTLY_PLAYED))
+    try:
+        next_cursor = None
+        try:
+            formatted, next_cursor = await playlist_history.page(limit, before)
+        except Exception as e:
+            logger.error(f"Error reading playlist history: {e}")
+            formatted = []
+
+        # Cold start (nothing ingested yet): fall back to the cached upstream proxy
+        if not formatted and before is None:
+            formatted = await _recent_from_upstream(limit)
+
+        # Include likes recorded here that are not flushed upstream yet
+        formatted = [
+            {**item, "likes": like_aggregator.overlay(item["documentId"], item["likes"])}
+            for item in formatted
+        ]
+        if enrich:
+            formatted = await _enrich_playlist_items(formatted)
+
         return {
             "success": True,
-            "data": formatted
+            "data": formatted,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"Error fetching recently played: {e}")
@@ -274,35 +646,50 @@ async def get_recently_played(limit: int = 5):
             "error": str(e)
         }
 
+@api_router.get("/recently-played")
+async def get_recently_played(request: Request, limit: int = 5, before: Optional[int] = None, enrich: bool = False):
+    """Recently played songs, newest first, served from the local playlist history
+
+    Page deeper with before=<next_cursor> from the previous response.
+    With enrich=true each item also carries its Spotify metadata under "spotify".
+    """
+    return conditional_json.render(request, await _recently_played_payload(limit, before, enrich))
+
+async def _read_upstream_likes(document_id: str) -> int:
+    response = await http_client.get(
+        f'{STRAPI_BASE_URL}/api/playlists/{document_id}',
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json().get('data', {}).get('likes', 0) or 0
+
+async def _write_upstream_likes(document_id: str, likes: int):
+    response = await http_client.put(
+        f'{STRAPI_BASE_URL}/api/playlists/{document_id}',
+        json={"data": {"likes": likes}},
+        timeout=10
+    )
+    response.raise_for_status()
+
+# Likes are counted locally and pushed upstream in coalesced batches
+like_aggregator = LikeAggregator(db, _read_upstream_likes, _write_upstream_likes)
+
 @api_router.post("/like-song/{document_id}")
-async def like_song(document_id: str):
-    """Increment like count for a song on TruckSimFM"""
-    import requests
+async def like_song(document_id: str, device_id: Optional[str] = None):
+    """Like a song; the count is returned immediately and synced to TruckSimFM in the background
+
+    Pass device_id to count at most one like per device per song. "likes" is
+    null on a song's first like, until its TruckSimFM count has been read.
+    """
     try:
-        # First, get the current song data to get the current like count
-        get_response = requests.get(
-            f'https://www.trucksim.fm/api/playlists/{document_id}',
-            timeout=10
-        )
-        get_response.raise_for_status()
-        song_data = get_response.json()
-        
-        current_likes = song_data.get('data', {}).get('likes', 0) or 0
-        new_likes = current_likes + 1
-        
-        # Update the like count
-        update_response = requests.put(
-            f'https://www.trucksim.fm/api/playlists/{document_id}',
-            json={"data": {"likes": new_likes}},
-            timeout=10
-        )
-        update_response.raise_for_status()
-        
-        logger.info(f"Liked song {document_id}: {current_likes} -> {new_likes}")
-        
+        likes, counted = await like_aggregator.record(document_id, device_id)
+
+        logger.info(f"Liked song {document_id}: {likes} (counted: {counted})")
+
         return {
             "success": True,
-            "likes": new_likes
+            "likes": likes,
+            "counted": counted
         }
     except Exception as e:
         logger.error(f"Error liking song {document_id}: {e}")
@@ -311,15 +698,124 @@ async def like_song(document_id: str):
             "error": str(e)
         }
 
+def _event_source(handler, **kwargs):
+    """Adapt a proxy endpoint into a broadcaster source that raises on failure"""
+    async def source():
+        payload = await handler(**kwargs)
+        if not payload.get("success"):
+            raise RuntimeError(payload.get("error", "upstream unavailable"))
+        return payload["data"]
+    return source
+
+# Push channel: one shared watcher (backed by upstream_cache) fans changes out
+# to every connected client instead of each device polling on its own
+now_playing = NowPlayingBroadcaster()
+now_playing.add_source("current-song", _event_source(_current_song_payload), CURRENT_SONG_TTL)
+now_playing.add_source("live-presenter", _event_source(_live_presenter_payload), CURRENT_SONG_TTL)
+now_playing.add_source("now-playing", _event_source(_now_playing_payload), CURRENT_SONG_TTL)
+now_playing.add_source("recently-played", _event_source(_recently_played_payload, limit=5), RECENTLY_PLAYED_TTL)
+
+@api_router.get("/now-playing/stream")
+async def stream_now_playing():
+    """Server-Sent Events stream of current song, presenter and recently-played changes"""
+    async def events():
+        async with now_playing.subscribe() as queue:
+            while True:
+                message = await next_message(queue, NOW_PLAYING_HEARTBEAT)
+                yield format_sse(message)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/now-playing/ws")
+async def now_playing_socket(websocket: WebSocket):
+    """WebSocket variant of the now-playing stream"""
+    await websocket.accept()
+    try:
+        async with now_playing.subscribe() as queue:
+            while True:
+                message = await next_message(queue, NOW_PLAYING_HEARTBEAT)
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+
+def _upstream_cache_hit_ratios():
+    lookups, hits = {}, {}
+    for (name, result), count in upstream_cache.stats.items():
+        lookups[name] = lookups.get(name, 0) + count
+        if result != 'miss':
+            hits[name] = hits.get(name, 0) + count
+    return [({'cache': name}, hits.get(name, 0) / total) for name, total in sorted(lookups.items())]
+
+def _track_cache_hit_ratio():
+    stats = spotify_service.cache.stats
+    total = sum(stats.values())
+    return (stats['memory'] + stats['mongo']) / total if total else 0
+
+metrics_registry.callback(
+    'upstream_cache_requests_total', 'Upstream cache lookups by result (hit, stale, miss)', 'counter',
+    lambda: [({'cache': name, 'result': result}, count)
+             for (name, result), count in sorted(upstream_cache.stats.items())],
+    ('cache', 'result'))
+metrics_registry.callback(
+    'upstream_cache_hit_ratio', 'Share of upstream cache lookups answered without waiting on upstream', 'gauge',
+    _upstream_cache_hit_ratios, ('cache',))
+metrics_registry.callback(
+    'track_cache_requests_total', 'Spotify track cache lookups by tier (memory, mongo, miss)', 'counter',
+    lambda: [({'tier': tier}, count) for tier, count in sorted(spotify_service.cache.stats.items())], ('tier',))
+metrics_registry.callback(
+    'track_cache_hit_ratio', 'Share of Spotify track lookups answered from the cache', 'gauge',
+    _track_cache_hit_ratio)
+metrics_registry.callback(
+    'track_catalogue_lookups_total', 'Fuzzy track catalogue lookups by result (hit, miss)', 'counter',
+    lambda: [({'result': result}, count) for result, count in sorted(spotify_service.catalogue.stats.items())],
+    ('result',))
+metrics_registry.callback(
+    'track_catalogue_tracks', 'Tracks in the in-memory fuzzy catalogue', 'gauge',
+    lambda: len(spotify_service.catalogue.tracks))
+metrics_registry.callback(
+    'art_cache_requests_total', 'Artwork requests by result (hit, fetch, error)', 'counter',
+    lambda: [({'result': result}, count) for result, count in sorted(art_cache.stats.items())],
+    ('result',))
+metrics_registry.callback(
+    'art_cache_bytes', 'Size of the resized artwork on disk', 'gauge',
+    lambda: art_cache.total_bytes)
+metrics_registry.callback(
+    'spotify_prefetch_total', 'Spotify prefetch submissions and lookups by outcome', 'counter',
+    lambda: [({'outcome': outcome}, count) for outcome, count in sorted(spotify_prefetcher.stats.items())],
+    ('outcome',))
+metrics_registry.callback(
+    'spotify_prefetch_queue_depth', 'Tracks waiting in the Spotify prefetch queue', 'gauge',
+    lambda: spotify_prefetcher.depth)
+metrics_registry.callback(
+    'spotify_token_refreshes_total', 'Spotify access token refreshes', 'counter',
+    lambda: token_manager.refresh_count)
+metrics_registry.callback(
+    'spotify_circuit_open', 'Whether the Spotify circuit breaker is open', 'gauge',
+    lambda: 0 if spotify_service.status()['available'] else 1)
+
+loop_lag_monitor = LoopLagMonitor()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -328,7 +824,128 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# httpx logs every upstream request at INFO, which floods the logs under load
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+async def _on_icy_title(title: str):
+    """The song changed on air: update the caches and push it now, not at the next poll"""
+    upstream_cache.put('current-song', title)
+    _on_song(title)
+    await shared_cache.publish('current-song', title)
+    now_playing.poke("current-song", "live-presenter", "now-playing")
+
+# In-band song-change detection on the leader; /currentsong polling is the fallback
+icy_listener = IcyListener(ICY_STREAM_URL, _on_icy_title)
+
+async def _recently_played_pairs() -> list:
+    payload = await _recently_played_payload(limit=MAX_RECENTLY_PLAYED)
+    return _playlist_pairs(payload["data"])
+
+async def _on_elected():
+    token_manager.start()
+    spotify_prefetcher.start()
+    spotify_prefetcher.warm(_recently_played_pairs)
+    playlist_history.start()
+    shared_cache.start()
+    icy_listener.start()
+
+async def _on_demoted():
+    await icy_listener.stop()
+    await shared_cache.stop()
+    await playlist_history.stop()
+    await spotify_prefetcher.stop()
+    await token_manager.stop()
+
+# The leader keeps the shared copies fresh even if it gets no requests itself
+shared_cache.every(CURRENT_SONG_TTL, lambda: upstream_cache.refresh('current-song', _fetch_current_song))
+shared_cache.every(SCHEDULE_TTL, lambda: upstream_cache.refresh('schedule', _fetch_schedule))
+
+leader_election = LeaderElection(db.leader_leases, 'upstream-refresh', _on_elected, _on_demoted)
+
+# attempted: every step has run once (the worker may take traffic);
+# done: every step has succeeded (failed steps keep retrying until then)
+warmup_state = {"attempted": False, "done": False, "seconds": None, "steps": {}}
+warmup_task: Optional[asyncio.Task] = None
+
+async def _ensure_indexes():
+    await asyncio.gather(
+        spotify_service.cache.ensure_indexes(),
+        spotify_service.catalogue.ensure_indexes(),
+        status_store.ensure_indexes(),
+        playlist_history.ensure_indexes(),
+        like_aggregator.ensure_indexes(),
+    )
+
+async def _warm_step(name: str, run) -> bool:
+    try:
+        await run()
+        warmup_state["steps"][name] = "ok"
+        return True
+    except Exception as e:
+        warmup_state["steps"][name] = f"error: {str(e) or type(e).__name__}"
+        logger.error(f"Warm-up step {name} failed: {e}")
+        return False
+
+async def _retry_warm_step(name: str, run):
+    """Re-run a failed step with exponential backoff until it succeeds
+
+    A follower gets no traffic of its own to fill its caches, and a missed
+    index (e.g. the unique like-dedup index) would otherwise never be built.
+    """
+    delay = WARMUP_RETRY_MIN
+    while True:
+        await asyncio.sleep(delay)
+        if await _warm_step(name, run):
+            logger.info(f"Warm-up step {name} succeeded on retry")
+            return
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+async def _warm_up():
+    """Create indexes and fill the token and upstream caches; retry whatever failed"""
+    started = time.monotonic()
+    steps = {
+        "indexes": _ensure_indexes,
+        "spotify_token": token_manager.get_token,
+        "track_catalogue": spotify_service.catalogue.load,
+        "art_cache": art_cache.load,
+        "current_song": lambda: upstream_cache.get(
+            'current-song', _fetch_current_song,
+            ttl=CURRENT_SONG_TTL, stale_ttl=CURRENT_SONG_STALE_TTL
+        ),
+        "schedule": lambda: upstream_cache.get(
+            'schedule', _fetch_schedule, ttl=SCHEDULE_TTL, stale_ttl=SCHEDULE_STALE_TTL
+        ),
+    }
+    results = await asyncio.gather(*(_warm_step(name, run) for name, run in steps.items()))
+    warmup_state["attempted"] = True
+    warmup_state["seconds"] = round(time.monotonic() - started, 3)
+    logger.info(f"Warm-up finished in {warmup_state['seconds']}s: {warmup_state['steps']}")
+
+    await asyncio.gather(*(
+        _retry_warm_step(name, run)
+        for (name, run), ok in zip(steps.items(), results) if not ok
+    ))
+    warmup_state["done"] = True
+
+async def startup():
+    """Start background work without waiting on any dependency, so the worker comes up at once"""
+    global warmup_task
+    loop_lag_monitor.start()
+    leader_election.start()
+    status_store.start()
+    like_aggregator.start()
+    spotify_service.catalogue.start()
+    warmup_task = asyncio.create_task(_warm_up())
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def shutdown():
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    # Stops the leader-only loops and hands the lease to another worker
+    await leader_election.stop()
+    # Both push whatever is still buffered before the Mongo client goes away
+    await like_aggregator.stop()
+    await status_store.stop()
+    await spotify_service.catalogue.stop()
+    await loop_lag_monitor.stop()
+    await http_client.aclose()
+    mongo.close()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+class SharedCache:
+    """Upstream results shared between workers through MongoDB.
+
+    The leader worker fetches from upstream and publishes each result to
+    the `shared_cache` collection; the other workers read the published
+    copy instead of calling upstream themselves. A follower only goes
+    upstream if the shared copy is missing or older than `max_age` (no
+    leader yet, or the leader is failing), so upstream load stays flat as
+    workers are added. The leader also runs periodic refresh jobs so the
+    shared copies stay fresh whether or not it receives requests itself.
+    """
+
+    def __init__(self, collection, is_leader: Callable[[], bool]):
+        self.collection = collection
+        self.is_leader = is_leader
+        self._jobs: List[Tuple[float, Fetcher]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    async def read(self, key: str, max_age: Optional[float] = None) -> Tuple[bool, Any]:
+        """Return (found, value) for the published copy of `key`"""
+        try:
+            doc = await self.collection.find_one({'_id': key})
+        except Exception as e:
+            logger.error(f'Shared cache read for "{key}" failed: {e}')
+            return False, None
+        if doc is None:
+            return False, None
+        if max_age is not None and (datetime.utcnow() - doc['updated_at']).total_seconds() > max_age:
+            return False, None
+        return True, doc.get('value')
+
+    async def publish(self, key: str, value: Any):
+        try:
+            await self.collection.update_one(
+                {'_id': key},
+                {'$set': {'value': value, 'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f'Shared cache publish for "{key}" failed: {e}')
+
+    async def get(self, key: str, fetcher: Fetcher, max_age: float) -> Any:
+        """Leader: fetch upstream and publish. Follower: read the shared copy, or fetch if it is stale"""
+        if not self.is_leader():
+            found, value = await self.read(key, max_age)
+            if found:
+                return value
+            logger.info(f'No fresh shared "{key}", fetching from upstream')
+            return await fetcher()
+
+        value = await fetcher()
+        await self.publish(key, value)
+        return value
+
+    def every(self, interval: float, job: Fetcher):
+        """Register a job the leader runs every `interval` seconds"""
+        self._jobs.append((interval, job))
+
+    async def _run_job(self, interval: float, job: Fetcher):
+        while True:
+            started = time.monotonic()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f'Shared cache refresh job failed: {e}')
+            await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run_job(interval, job)) for interval, job in self._jobs]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,54 @@
+import re
+from typing import Dict, Optional
+
+# Server-side port of parseSongString/smartTitleCase from the app's
+# radioService.ts; keep the two in sync so both produce the same strings.
+
+PRESERVE_PATTERNS = ['DJ', 'MC', 'ft', 'feat', 'vs', 'x']
+SEPARATORS = [' - ', ' – ', ' — ', ' | ', ' / ']
+UNKNOWN_ARTIST = 'Unknown Artist'
+
+
+def _capitalize(word: str) -> str:
+    return word[:1].upper() + word[1:].lower()
+
+
+def smart_title_case(text: str) -> str:
+    words = []
+    for word in text.split(' '):
+        lower = word.lower()
+        # Same comparison as the app: lowercase word against each pattern as written
+        if any(lower == p or lower == p + '.' for p in PRESERVE_PATTERNS):
+            words.append(lower)
+        elif '(' in word or '[' in word:
+            words.append(''.join(
+                part if part in ('(', '[') else _capitalize(part)
+                for part in re.split(r'([(\[])', word)
+            ))
+        else:
+            words.append(_capitalize(word))
+    return ' '.join(words)
+
+
+def parse_song_string(text: str) -> Optional[Dict[str, str]]:
+    """Split "Artist - Title" on the first separator that yields both parts"""
+    for sep in SEPARATORS:
+        index = text.find(sep)
+        if index > 0:
+            artist = text[:index].strip()
+            title = text[index + len(sep):].strip()
+            if artist and title:
+                return {
+                    'artist': smart_title_case(artist),
+                    'title': smart_title_case(title),
+                }
+    return None
+
+
+def parse_now_playing(song_text: str) -> Dict[str, object]:
+    """Artist/title for display; unparseable text becomes the title of an unknown artist"""
+    trimmed = song_text.strip()
+    parsed = parse_song_string(trimmed)
+    if parsed:
+        return {**parsed, 'parsed': True}
+    return {'artist': UNKNOWN_ARTIST, 'title': smart_title_case(trimmed), 'parsed': False}
@@ -1,65 +1,64 @@
+import asyncio
 import os
-import requests
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+import httpx
+
+from http_client import http_client
+from metrics import SPOTIFY_SEARCH_ATTEMPTS, SPOTIFY_SEARCH_MATCHES
+from resilience import CircuitBreaker, CircuitOpen, RateLimited, TokenBucket, parse_retry_after
+from track_cache import MISS, TrackCache
+from track_catalogue import TrackCatalogue
+from track_matcher import best_candidate
+from spotify_token import token_manager
 
 logger = logging.getLogger(__name__)
 
+# Artwork shown while Spotify is unavailable (the station logo the app falls back to)
+PLACEHOLDER_ART_URL = os.environ.get(
+    'SPOTIFY_PLACEHOLDER_ART', 'https://trucksim.fm/uploads/TSFM_25_IMG_57adbe1a8b.png'
+)
+
+# Candidates requested per search; every one is ranked, so a wider net on a
+# single call replaces falling through to another strategy
+SEARCH_LIMIT = 5
+
+class SpotifySearchIncomplete(Exception):
+    """No match was found, but at least one strategy failed with an error"""
+
 class SpotifyService:    
-    def __init__(self):        
-        self.client_id = os.environ.get('SPOTIFY_CLIENT_ID')
-        self.client_secret = os.environ.get('SPOTIFY_CLIENT_SECRET')
-        self.access_token = None
-        self.token_expires_at = None
-        
-        if not self.client_id or not self.client_secret:
+    def __init__(self, cache: Optional[TrackCache] = None, catalogue: Optional[TrackCatalogue] = None):        
+        self.cache = cache
+        self.catalogue = catalogue
+        self.api_url = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com')
+        # 'sequential', 'hedged' or 'concurrent' execution of the fallback strategies;
+        # the overlapping modes spend more of the Spotify quota, so they are opt-in
+        self.search_mode = os.environ.get('SPOTIFY_SEARCH_MODE', 'sequential')
+        self.hedge_delay = float(os.environ.get('SPOTIFY_HEDGE_DELAY', '0.5'))
+        # Normalized track key -> lookup in flight
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.tokens = token_manager
+        # Client-side quota and failure handling for api.spotify.com
+        self.limiter = TokenBucket(
+            rate=float(os.environ.get('SPOTIFY_RATE_LIMIT', '10')),
+            capacity=float(os.environ.get('SPOTIFY_RATE_BURST', '20'))
+        )
+        self.max_queue_wait = float(os.environ.get('SPOTIFY_MAX_QUEUE_WAIT', '2'))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get('SPOTIFY_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.environ.get('SPOTIFY_BREAKER_RESET', '30')),
+            name='Spotify'
+        )
+
+        if not self.tokens.client_id or not self.tokens.client_secret:
             logger.error('Spotify credentials not found in environment variables')
         else:
             logger.info(f'Spotify service initialized successfully')
         
-    def _get_access_token(self) -> str:
-        """Get Spotify access token using client credentials flow"""
-        # Check if we have a valid token
-        if self.access_token and self.token_expires_at:
-            if datetime.now() < self.token_expires_at:
-                return self.access_token
-        
-        # Get new token using Basic Auth
-        auth_url = 'https://accounts.spotify.com/api/token'
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        auth_data = {
-            'grant_type': 'client_credentials'
-        }
-        
-        try:
-            # Use Basic Auth with client_id and client_secret
-            from requests.auth import HTTPBasicAuth
-            response = requests.post(
-                auth_url, 
-                headers=headers,
-                data=auth_data, 
-                auth=HTTPBasicAuth(self.client_id, self.client_secret),
-                timeout=10
-            )
-            response.raise_for_status()
-            token_data = response.json()
-            
-            self.access_token = token_data['access_token']
-            # Token expires in seconds, store expiry time with 5 min buffer
-            expires_in = token_data.get('expires_in', 3600)
-            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 300)
-            
-            logger.info('Successfully obtained Spotify access token')
-            return self.access_token
-            
-        except Exception as e:
-            logger.error(f'Failed to get Spotify access token: {e}')
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f'Response content: {e.response.text}')
-            raise
+    async def _get_access_token(self) -> str:
+        """Get the shared Spotify access token (refreshed in the background)"""
+        return await self.tokens.get_token()
     
     def _clean_search_term(self, term: str) -> str:
         """Clean search term by removing common extras and special characters"""
@@ -73,9 +72,87 @@ class SpotifyService:
         term = ' '.join(term.split())
         return term.strip()
     
-    def _search_with_query(self, token: str, query: str, limit: int = 1) -> Optional[Dict[str, Any]]:
-        """Perform a single Spotify search with the given query"""
-        search_url = 'https://api.spotify.com/v1/search'
+    async def _guarded_get(self, url: str, **kwargs) -> httpx.Response:
+        """GET through the rate limiter and circuit breaker (raises on HTTP errors)"""
+        if not self.breaker.allow():
+            raise CircuitOpen('Spotify circuit is open')
+        try:
+            await self.limiter.acquire(max_wait=self.max_queue_wait)
+            response = await http_client.get(url, timeout=10, **kwargs)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except RateLimited:
+            self.breaker.release()
+            raise
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After', '')
+            pause = parse_retry_after(retry_after)
+            logger.warning(f'Spotify rate limited us, pausing for {pause:.0f}s')
+            self.limiter.pause(pause)
+            self.breaker.record_failure()
+            raise RateLimited(f'Spotify returned 429 (Retry-After: {retry_after or "n/a"})')
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            response.raise_for_status()
+
+        self.breaker.record_success()
+        response.raise_for_status()
+        return response
+
+    def status(self) -> Dict[str, Any]:
+        """Limiter and circuit breaker state, for the app and for operators"""
+        return {
+            'available': self.breaker.state != 'open',
+            'circuit': self.breaker.snapshot(),
+            'rate_limit': self.limiter.snapshot(),
+        }
+
+    def placeholder_track(self, artist: str, title: str) -> Dict[str, Any]:
+        """Stand-in metadata with the placeholder art, for when Spotify can't be asked (never cached)"""
+        return {
+            'title': title,
+            'artist': artist,
+            'album': None,
+            'album_art_url': PLACEHOLDER_ART_URL,
+            'album_art_small': PLACEHOLDER_ART_URL,
+            'album_art_medium': PLACEHOLDER_ART_URL,
+            'release_date': None,
+            'spotify_url': None,
+            'duration_ms': None,
+            'preview_url': None,
+            'placeholder': True,
+        }
+
+    def _format_track(self, track: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw Spotify track object into our response shape"""
+        album = track.get('album', {})
+        images = album.get('images', [])
+
+        # Get the highest quality image (first in array)
+        album_art_url = images[0]['url'] if images else None
+
+        return {
+            'title': track.get('name'),
+            'artist': ', '.join([a['name'] for a in track.get('artists', [])]),
+            'album': album.get('name'),
+            'album_art_url': album_art_url,
+            'album_art_small': images[-1]['url'] if images else None,
+            'album_art_medium': images[1]['url'] if len(images) > 1 else album_art_url,
+            'release_date': album.get('release_date'),
+            'spotify_url': track.get('external_urls', {}).get('spotify'),
+            'duration_ms': track.get('duration_ms'),
+            'preview_url': track.get('preview_url'),
+        }
+
+    async def _search_with_query(self, token: str, query: str, artist: str, title: str,
+                                 limit: int = SEARCH_LIMIT) -> Optional[Dict[str, Any]]:
+        """Perform a single Spotify search and return the best-ranked candidate (raises on HTTP errors)"""
+        search_url = f'{self.api_url}/v1/search'
         headers = {'Authorization': f'Bearer {token}'}
         params = {
             'q': query,
@@ -83,147 +160,204 @@ class SpotifyService:
             'limit': limit
         }
         
-        try:
-            response = requests.get(search_url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            tracks = data.get('tracks', {}).get('items', [])
+        response = await self._guarded_get(search_url, headers=headers, params=params)
+        data = response.json()
+
+        tracks = data.get('tracks', {}).get('items', [])
+        match = best_candidate(tracks, artist, title)
+        if match is None:
             if tracks:
-                track = tracks[0]
-                album = track.get('album', {})
-                images = album.get('images', [])
-                
-                # Get the highest quality image (first in array)
-                album_art_url = images[0]['url'] if images else None
-                
-                return {
-                    'title': track.get('name'),
-                    'artist': ', '.join([a['name'] for a in track.get('artists', [])]),
-                    'album': album.get('name'),
-                    'album_art_url': album_art_url,
-                    'album_art_small': images[-1]['url'] if images else None,
-                    'album_art_medium': images[1]['url'] if len(images) > 1 else album_art_url,
-                    'release_date': album.get('release_date'),
-                    'spotify_url': track.get('external_urls', {}).get('spotify'),
-                    'duration_ms': track.get('duration_ms'),
-                    'preview_url': track.get('preview_url'),
-                    '_all_results': tracks  # Store all results for validation
-                }
-            return None
-        except Exception as e:
-            logger.error(f'Error in Spotify search query "{query}": {e}')
-            return None
-    
-    def _validate_match(self, result: Dict[str, Any], original_artist: str, original_title: str) -> bool:
-        """Validate if a Spotify result is likely a correct match"""
-        if not result:
-            return False
-        
-        import re
-        
-        # Normalize strings for comparison
-        def normalize(s: str) -> str:
-            s = s.lower()
-            # Remove common separators and special chars
-            s = re.sub(r'[&,x\-\+\(\)\[\]\'"]', ' ', s)
-            # Remove extra whitespace
-            s = ' '.join(s.split())
-            return s
-        
-        result_title = normalize(result.get('title', ''))
-        result_artist = normalize(result.get('artist', ''))
-        search_title = normalize(original_title)
-        search_artist = normalize(original_artist)
-        
-        # Check if the title matches (at least 80% of words)
-        title_words = set(search_title.split())
-        result_title_words = set(result_title.split())
-        
-        if title_words and result_title_words:
-            title_overlap = len(title_words & result_title_words) / len(title_words)
-            if title_overlap < 0.5:  # Less than 50% overlap is suspicious
-                logger.info(f"Title match low: {title_overlap:.0%} overlap")
-                return False
-        
-        # Check if artist appears in result
-        artist_words = set(search_artist.split())
-        result_artist_words = set(result_artist.split())
-        
-        if artist_words and result_artist_words:
-            artist_overlap = len(artist_words & result_artist_words) / len(artist_words)
-            if artist_overlap < 0.3:  # Less than 30% overlap might be wrong
-                logger.info(f"Artist match low: {artist_overlap:.0%} overlap")
-                # Don't reject, but log it
-        
-        return True
-    
-    def search_track(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
-        """Search for a track on Spotify with multiple fallback strategies"""
-        if not artist or not title:
-            logger.warning('Artist or title is missing')
+                logger.info(f'No candidate out of {len(tracks)} cleared the match threshold')
             return None
-            
-        try:
-            token = self._get_access_token()
-            
-            # Clean the search terms
-            clean_artist = self._clean_search_term(artist)
-            clean_title = self._clean_search_term(title)
-            
+
+        track, score = match
+        logger.info(f'Best candidate "{track.get("name")}" scored {score:.2f}')
+        return self._format_track(track)
+
+    def _build_strategies(self, artist: str, title: str) -> List[Tuple[str, str]]:
+        """Return the (name, query) fallback strategies in priority order"""
+        # Clean the search terms
+        clean_artist = self._clean_search_term(artist)
+        clean_title = self._clean_search_term(title)
+
+        strategies = [
             # Strategy 1: Strict search with artist and track fields
-            logger.info(f'Trying strict search: artist:"{clean_artist}" track:"{clean_title}"')
-            query = f'artist:"{clean_artist}" track:"{clean_title}"'
-            result = self._search_with_query(token, query)
-            if result and self._validate_match(result, artist, title):
-                logger.info(f'✓ Found match with strict search for: {artist} - {title}')
-                # Remove internal data before returning
-                result.pop('_all_results', None)
-                return result
-            
+            ('strict search', f'artist:"{clean_artist}" track:"{clean_title}"'),
             # Strategy 2: Less strict with unquoted terms
-            logger.info(f'Trying unquoted search: artist:{clean_artist} track:{clean_title}')
-            query = f'artist:{clean_artist} track:{clean_title}'
-            result = self._search_with_query(token, query)
-            if result and self._validate_match(result, artist, title):
-                logger.info(f'✓ Found match with unquoted search for: {artist} - {title}')
-                result.pop('_all_results', None)
-                return result
-            
+            ('unquoted search', f'artist:{clean_artist} track:{clean_title}'),
             # Strategy 3: General search with both terms (no field specifiers)
-            logger.info(f'Trying general search: {clean_artist} {clean_title}')
-            query = f'{clean_artist} {clean_title}'
-            result = self._search_with_query(token, query, limit=5)
-            if result and self._validate_match(result, artist, title):
-                logger.info(f'✓ Found match with general search for: {artist} - {title}')
-                result.pop('_all_results', None)
-                return result
-            
-            # Strategy 4: Search with original (uncleaned) terms
-            if clean_artist != artist or clean_title != title:
-                logger.info(f'Trying original terms: {artist} {title}')
-                query = f'{artist} {title}'
-                result = self._search_with_query(token, query, limit=5)
-                if result and self._validate_match(result, artist, title):
-                    logger.info(f'✓ Found match with original terms for: {artist} - {title}')
-                    result.pop('_all_results', None)
+            ('general search', f'{clean_artist} {clean_title}'),
+        ]
+        # Strategy 4: Search with original (uncleaned) terms
+        if clean_artist != artist or clean_title != title:
+            strategies.append(('original terms', f'{artist} {title}'))
+        # Strategy 5: Try just the track title (for cases where artist might be wrong/misspelled)
+        strategies.append(('title-only search', f'track:"{clean_title}"'))
+        return strategies
+
+    async def _attempt(self, token: str, name: str, query: str,
+                       artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Run one strategy; return the best validated match or None (raises on HTTP errors)"""
+        logger.info(f'Trying {name}: {query}')
+        return await self._search_with_query(token, query, artist, title)
+
+    def _stagger(self) -> Optional[float]:
+        """Seconds to wait before launching the next strategy (None = wait for the previous one)"""
+        if self.search_mode == 'concurrent':
+            return 0
+        if self.search_mode == 'hedged':
+            return self.hedge_delay
+        return None
+
+    async def _run_strategies(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Try the strategies in priority order; raise SpotifySearchIncomplete if a miss may be due to errors
+
+        Depending on search_mode, lower-priority strategies are started while
+        higher-priority ones are still in flight ('concurrent' starts them all,
+        'hedged' staggers them by hedge_delay). The winner is always the
+        highest-priority strategy that validates; everything else is cancelled.
+        """
+        token = await self._get_access_token()
+        strategies = self._build_strategies(artist, title)
+        stagger = self._stagger()
+        tasks: List[asyncio.Task] = []
+
+        def launch_next():
+            name, query = strategies[len(tasks)]
+            SPOTIFY_SEARCH_ATTEMPTS.inc(strategy=len(tasks) + 1, name=name)
+            tasks.append(asyncio.create_task(self._attempt(token, name, query, artist, title)))
+
+        failed = False
+        try:
+            if stagger == 0:
+                while len(tasks) < len(strategies):
+                    launch_next()
+
+            for i, (name, query) in enumerate(strategies):
+                if len(tasks) <= i:
+                    launch_next()
+                # Hedge: while this strategy is slow, start the next ones
+                while not tasks[i].done() and stagger is not None and len(tasks) < len(strategies):
+                    done, _ = await asyncio.wait([tasks[i]], timeout=stagger)
+                    if not done:
+                        launch_next()
+
+                try:
+                    result = await tasks[i]
+                except (CircuitOpen, RateLimited) as e:
+                    # Spotify wants us to back off: don't pile on more strategies
+                    logger.warning(f'Stopping Spotify search for {artist} - {title}: {e}')
+                    raise SpotifySearchIncomplete(str(e))
+                except Exception as e:
+                    logger.error(f'Error in Spotify search query "{query}": {e}')
+                    failed = True
+                    continue
+
+                if result:
+                    logger.info(f'✓ Found match with {name} for: {artist} - {title}')
+                    SPOTIFY_SEARCH_MATCHES.inc(strategy=i + 1, name=name)
                     return result
-            
-            # Strategy 5: Try just the track title (for cases where artist might be wrong/misspelled)
-            logger.info(f'Trying title-only search: {clean_title}')
-            query = f'track:"{clean_title}"'
-            result = self._search_with_query(token, query, limit=5)
-            if result and self._validate_match(result, artist, title):
-                logger.info(f'✓ Found match with title-only search for: {artist} - {title}')
-                result.pop('_all_results', None)
-                return result
-            
-            logger.warning(f'✗ No Spotify results found after all strategies for: {artist} - {title}')
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if failed:
+            raise SpotifySearchIncomplete(f'Some strategies failed for: {artist} - {title}')
+
+        logger.warning(f'✗ No Spotify results found after all strategies for: {artist} - {title}')
+        SPOTIFY_SEARCH_MATCHES.inc(strategy='none', name='not found')
+        return None
+
+    async def _resolve(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        result = await self._run_strategies(artist, title)
+
+        if self.cache is not None:
+            await self.cache.set(artist, title, result)
+        if self.catalogue is not None and result:
+            await self.catalogue.add(artist, title, result)
+        return result
+
+    async def _lookup(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Cached search_track that raises instead of hiding upstream errors
+
+        Concurrent misses for the same track (a song change, a prefetch and
+        the first clients) share one strategy chain instead of each running it.
+        """
+        # Exact resolutions (including cached "not found") win over fuzzy matches
+        if self.cache is not None:
+            cached = await self.cache.get(artist, title)
+            if cached is not MISS:
+                return cached
+
+        if self.catalogue is not None:
+            match = self.catalogue.match(artist, title)
+            if match is not None:
+                track, confidence = match
+                logger.info(f'Catalogue match for {artist} - {title} (confidence {confidence:.2f})')
+                # Repeats of this spelling are then answered by the LRU, without a Mongo round trip
+                if self.cache is not None:
+                    self.cache.remember(artist, title, track)
+                return track
+
+        key = TrackCache.make_key(artist, title)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._resolve(artist, title))
+            self._inflight[key] = task
+
+            def done(t: asyncio.Task):
+                self._inflight.pop(key, None)
+                # Retrieve the error even if every waiter was cancelled
+                if not t.cancelled():
+                    t.exception()
+            task.add_done_callback(done)
+
+        # Shielded: one caller going away must not cancel the others' lookup
+        return await asyncio.shield(task)
+
+    async def search_track(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Search for a track on Spotify with multiple fallback strategies"""
+        if not artist or not title:
+            logger.warning('Artist or title is missing')
             return None
-            
+
+        try:
+            return await self._lookup(artist, title)
         except Exception as e:
+            # Not cached: a miss caused by errors is not a real negative result
             logger.error(f'Error searching Spotify: {e}')
             return None
 
+    async def search_many(self, pairs: List[Tuple[str, str]], concurrency: int = 4) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Resolve many artist/title pairs, deduplicated and at most `concurrency` at a time
+
+        Returns one (status, result) per input pair, in input order, where
+        status is 'found', 'not_found', 'error' or 'unavailable' (circuit open).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        lookups: Dict[str, asyncio.Task] = {}
+
+        async def resolve(artist: str, title: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+            if not artist or not title:
+                return 'not_found', None
+            async with semaphore:
+                try:
+                    result = await self._lookup(artist, title)
+                except Exception as e:
+                    logger.error(f'Error searching Spotify for {artist} - {title}: {e}')
+                    return ('unavailable' if self.breaker.state == 'open' else 'error'), None
+            return ('found', result) if result else ('not_found', None)
+
+        keys = []
+        for artist, title in pairs:
+            key = TrackCache.make_key(artist or '', title or '')
+            if key not in lookups:
+                lookups[key] = asyncio.create_task(resolve(artist, title))
+            keys.append(key)
+
+        await asyncio.gather(*lookups.values())
+        return [lookups[key].result() for key in keys]
+
 # Create a singleton instance
 spotify_service = SpotifyService()
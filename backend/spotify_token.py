@@ -0,0 +1,172 @@
+import asyncio
+import os
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from http_client import http_client
+from resilience import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+# Shared cache key the leader worker publishes the token under
+SHARED_TOKEN_KEY = 'spotify-token'
+
+
+class SpotifyTokenManager:
+    """Process-wide Spotify client-credentials token.
+
+    A background task refreshes the token `refresh_margin` seconds before it
+    expires, so request paths normally never wait on accounts.spotify.com.
+    If a caller does find the token missing or expired, all concurrent
+    callers share one refresh instead of racing to POST for their own.
+
+    With a `shared` cache set, only the leader worker runs the refresh loop
+    and publishes its token; other workers adopt the published token.
+    With a `breaker` set, token requests go through the same circuit as
+    the API calls, so an accounts.spotify.com outage fails fast too.
+    """
+
+    def __init__(self):
+        self.client_id = os.environ.get('SPOTIFY_CLIENT_ID')
+        self.client_secret = os.environ.get('SPOTIFY_CLIENT_SECRET')
+        self.accounts_url = os.environ.get('SPOTIFY_ACCOUNTS_URL', 'https://accounts.spotify.com')
+        self.refresh_margin = float(os.environ.get('SPOTIFY_TOKEN_REFRESH_MARGIN', '300'))
+        self.access_token: Optional[str] = None
+        self.expires_at = 0.0  # time.monotonic() deadline
+        self.refresh_count = 0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.shared = None  # SharedCache, set when running with several workers
+        self.breaker = None  # CircuitBreaker shared with the Spotify API calls
+
+    @property
+    def is_valid(self) -> bool:
+        return self.access_token is not None and time.monotonic() < self.expires_at
+
+    async def get_token(self) -> str:
+        if self.is_valid:
+            return self.access_token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """Fetch a new token; concurrent callers share the same request"""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._obtain())
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled():
+            task.exception()
+
+    async def _obtain(self) -> str:
+        """Adopt the leader's published token while it is good, otherwise fetch one"""
+        if self.shared is not None and not self.shared.is_leader():
+            found, published = await self.shared.read(SHARED_TOKEN_KEY)
+            if found and published and published['expires_at'] - time.time() > 60:
+                self.access_token = published['access_token']
+                self.expires_at = time.monotonic() + published['expires_at'] - time.time()
+                return self.access_token
+
+        token = await self._fetch_token()
+        if self.shared is not None and self.shared.is_leader():
+            # Published with a wall-clock expiry, since monotonic clocks are per process
+            await self.shared.publish(SHARED_TOKEN_KEY, {
+                'access_token': token,
+                'expires_at': time.time() + self.expires_at - time.monotonic(),
+            })
+        return token
+
+    async def _guarded_post(self, url: str, **kwargs) -> httpx.Response:
+        """POST through the circuit breaker, if one is set"""
+        if self.breaker is None:
+            return await http_client.post(url, **kwargs)
+        if not self.breaker.allow():
+            raise CircuitOpen('Spotify circuit is open')
+        try:
+            response = await http_client.post(url, **kwargs)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def _fetch_token(self) -> str:
+        """Get Spotify access token using client credentials flow"""
+        auth_url = f'{self.accounts_url}/api/token'
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+        auth_data = {
+            'grant_type': 'client_credentials'
+        }
+
+        try:
+            # Use Basic Auth with client_id and client_secret
+            response = await self._guarded_post(
+                auth_url,
+                headers=headers,
+                data=auth_data,
+                auth=httpx.BasicAuth(self.client_id or '', self.client_secret or ''),
+                timeout=10
+            )
+            response.raise_for_status()
+            token_data = response.json()
+        except Exception as e:
+            logger.error(f'Failed to get Spotify access token: {e}')
+            if hasattr(e, 'response') and e.response is not None:
+                logger.error(f'Response content: {e.response.text}')
+            raise
+
+        self.access_token = token_data['access_token']
+        # Keep a one-minute safety buffer on the hard expiry
+        expires_in = token_data.get('expires_in', 3600)
+        self.expires_at = time.monotonic() + expires_in - 60
+        self.refresh_count += 1
+
+        logger.info('Successfully obtained Spotify access token')
+        return self.access_token
+
+    async def _refresh_loop(self):
+        retry_delay = 5.0
+        while True:
+            if self.access_token is None:
+                delay = 0.0
+            else:
+                delay = max(self.expires_at - self.refresh_margin - time.monotonic(), 30.0)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+                retry_delay = 5.0
+            except Exception:
+                # Back off; the current token (if any) stays usable until expiry
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 300.0)
+
+    def start(self):
+        """Start proactive background refreshing"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+
+# Create a singleton instance
+token_manager = SpotifyTokenManager()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    return f"{doc['timestamp'].isoformat()}|{doc['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    timestamp, _, doc_id = cursor.partition('|')
+    return datetime.fromisoformat(timestamp), doc_id
+
+
+class StatusCheckStore:
+    """Storage for status checks: indexed keyset reads and optionally buffered writes.
+
+    By default each check is inserted before POST /api/status returns, so
+    it is readable straight away. For high-rate pings, STATUS_CHECK_BUFFER=1
+    queues writes instead and inserts them with one insert_many per flush
+    (every `flush_interval` seconds or once `batch_size` checks are queued);
+    reads then lag writes by up to a flush. A failed flush keeps the batch
+    for the next attempt, up to `max_buffer` checks; stop() flushes whatever
+    is still queued, so a clean shutdown loses nothing.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.buffered = os.environ.get('STATUS_CHECK_BUFFER', '0') not in ('0', 'false', 'False')
+        self.batch_size = int(os.environ.get('STATUS_CHECK_BATCH_SIZE', '500'))
+        self.flush_interval = float(os.environ.get('STATUS_CHECK_FLUSH_INTERVAL', '1'))
+        self.max_buffer = int(os.environ.get('STATUS_CHECK_MAX_BUFFER', '10000'))
+        # Retention is opt-in: 0 keeps status checks forever
+        self.ttl_days = float(os.environ.get('STATUS_CHECK_TTL_DAYS', '0'))
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([('timestamp', DESCENDING), ('id', DESCENDING)])
+        if self.ttl_days <= 0:
+            await self._drop_ttl_index()
+            return
+        ttl_seconds = int(self.ttl_days * 86400)
+        try:
+            await self.collection.create_index('timestamp', expireAfterSeconds=ttl_seconds)
+        except OperationFailure:
+            # The TTL index already exists with another expiry; update it in place
+            await self.collection.database.command(
+                'collMod', self.collection.name,
+                index={'keyPattern': {'timestamp': 1}, 'expireAfterSeconds': ttl_seconds}
+            )
+
+    async def _drop_ttl_index(self):
+        """Stop expiring status checks if an earlier deploy enabled retention"""
+        for name, info in (await self.collection.index_information()).items():
+            if 'expireAfterSeconds' in info and info['key'] == [('timestamp', 1)]:
+                await self.collection.drop_index(name)
+                logger.info(f'Dropped status check TTL index {name}: retention is disabled')
+
+    async def add(self, doc: Dict[str, Any]):
+        if not self.buffered:
+            await self.collection.insert_one(dict(doc))
+            return
+        self._buffer.append(dict(doc))
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                logger.error(f"Failed to insert {len(batch)} status checks: {e}")
+                self._buffer = batch + self._buffer
+                overflow = len(self._buffer) - self.max_buffer
+                if overflow > 0:
+                    logger.error(f"Dropping {overflow} oldest buffered status checks")
+                    del self._buffer[:overflow]
+
+    async def page(self, limit: int, before: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page keyed on (timestamp, id); returns (docs, next cursor)"""
+        query: Dict[str, Any] = {}
+        if before:
+            timestamp, doc_id = decode_cursor(before)
+            query = {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, 'id': {'$lt': doc_id}},
+            ]}
+        docs = await self.collection.find(query, {'_id': 0}).sort(
+            [('timestamp', DESCENDING), ('id', DESCENDING)]
+        ).limit(limit).to_list(limit)
+        next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+        return docs, next_cursor
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def start(self):
+        if self.buffered and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
@@ -0,0 +1,115 @@
+import os
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by TrackCache.get on a miss (None is a cached "not found")
+MISS = object()
+
+
+class TrackCache:
+    """Two-tier cache for Spotify track resolutions.
+
+    Tier 1 is a bounded in-process LRU, tier 2 a MongoDB collection so
+    resolutions survive restarts and are shared between workers. Both tiers
+    are keyed on the normalized artist/title pair. Negative results ("no
+    match on Spotify") are stored too, with a shorter TTL.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self.max_entries = int(os.environ.get('TRACK_CACHE_SIZE', '2048'))
+        self.ttl = int(os.environ.get('TRACK_CACHE_TTL', str(30 * 24 * 3600)))
+        self.negative_ttl = int(os.environ.get('TRACK_CACHE_NEGATIVE_TTL', '3600'))
+        self._lru: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        # 'memory' | 'mongo' | 'miss' -> count
+        self.stats: Counter = Counter()
+
+    @staticmethod
+    def make_key(artist: str, title: str) -> str:
+        """Normalize an artist/title pair into a cache key"""
+        def normalize(s: str) -> str:
+            return ' '.join(s.casefold().split())
+        return f'{normalize(artist)}|{normalize(title)}'
+
+    async def ensure_indexes(self):
+        if self.collection is None:
+            return
+        await self.collection.create_index('key', unique=True)
+        # Mongo removes documents once expires_at has passed
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def _remember(self, key: str, value: Optional[Dict[str, Any]], expires_at: float):
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def remember(self, artist: str, title: str, value: Optional[Dict[str, Any]]):
+        """Keep a result in the in-process tier only (e.g. a fuzzy match found elsewhere)"""
+        ttl = self.ttl if value else self.negative_ttl
+        self._remember(self.make_key(artist, title), value, time.time() + ttl)
+
+    async def get(self, artist: str, title: str) -> Any:
+        """Return the cached result (possibly None for a known miss) or MISS"""
+        key = self.make_key(artist, title)
+
+        entry = self._lru.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._lru.move_to_end(key)
+                self.stats['memory'] += 1
+                return value
+            del self._lru[key]
+
+        if self.collection is None:
+            self.stats['miss'] += 1
+            return MISS
+
+        try:
+            doc = await self.collection.find_one({'key': key}, {'_id': 0})
+        except Exception as e:
+            logger.error(f'Track cache lookup failed for "{key}": {e}')
+            self.stats['miss'] += 1
+            return MISS
+
+        # The TTL monitor only runs once a minute, so check expiry ourselves
+        if not doc or doc['expires_at'] <= datetime.utcnow():
+            self.stats['miss'] += 1
+            return MISS
+
+        self.stats['mongo'] += 1
+        value = doc.get('result')
+        self._remember(key, value, time.time() + (doc['expires_at'] - datetime.utcnow()).total_seconds())
+        return value
+
+    async def set(self, artist: str, title: str, value: Optional[Dict[str, Any]]):
+        key = self.make_key(artist, title)
+        ttl = self.ttl if value else self.negative_ttl
+        self._remember(key, value, time.time() + ttl)
+
+        if self.collection is None:
+            return
+
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {'key': key},
+                {'$set': {
+                    'key': key,
+                    'artist': artist,
+                    'title': title,
+                    'result': value,
+                    'found': value is not None,
+                    'updated_at': now,
+                    'expires_at': now + timedelta(seconds=ttl),
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f'Track cache write failed for "{key}": {e}')
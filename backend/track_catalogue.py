@@ -0,0 +1,263 @@
+import asyncio
+import os
+import logging
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from track_cache import TrackCache
+from track_matcher import (
+    ARTIST_WEIGHT, IGNORED_TOKENS, TITLE_WEIGHT, VERSION_MARKERS, VERSION_PENALTY, normalize, tokens
+)
+
+logger = logging.getLogger(__name__)
+
+# Words shorter than this must match exactly; longer ones may differ by one edit (typos)
+MIN_FUZZY_TOKEN = 3
+# Misspelled words tolerated per this many title words (at least one)
+WORDS_PER_TYPO = 4
+# Title confidence lost per misspelled word
+TYPO_COST = 0.1
+
+
+def catalogue_form(s: str) -> str:
+    """Normalized form that is indexed: no bracketed extras, " - Radio Edit"-style suffixes,
+    punctuation or "feat"-style filler"""
+    stripped = re.sub(r'\([^)]*\)|\[[^\]]*\]', ' ', s)
+    stripped = re.sub(r'\s+-\s+.*$', '', stripped)
+    # "Don't" and "Dont" are the same word
+    stripped = re.sub(r"['’]", '', stripped)
+    words = [w for w in normalize(stripped).split() if w not in IGNORED_TOKENS]
+    return ' '.join(words) or normalize(s)
+
+
+def trigrams(s: str) -> Set[str]:
+    padded = f'  {s} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # Substitution, insertion or deletion at i; the rest must line up
+    return a[i + 1:] == b[i + 1:] or a[i:] == b[i + 1:]
+
+
+def _is_typo(word: str, other: str) -> bool:
+    """Whether `word` is a misspelling of `other` ("Night" and "Nights" are different words)"""
+    if min(len(word), len(other)) < MIN_FUZZY_TOKEN:
+        return False
+    if word + 's' == other or other + 's' == word:
+        return False
+    return _one_edit_apart(word, other)
+
+
+def word_typos(a: Set[str], b: Set[str]) -> Optional[int]:
+    """Number of misspelled words between two titles, or None if a word of either
+    has no counterpart in the other (so "Paradise" is not "Paradise City")"""
+    typos = 0
+    for words, others in ((a, b), (b, a)):
+        unmatched = others - words
+        missing = words - others
+        if not all(any(_is_typo(word, other) for other in unmatched) for word in missing):
+            return None
+        typos = max(typos, len(missing))
+    return typos
+
+
+class _Row(NamedTuple):
+    """One indexed spelling (alias) of a catalogued track"""
+    track_id: str
+    title_words: Set[str]
+    title_grams: Set[str]
+    artist_grams: Set[str]
+    versions: Set[str]
+
+
+class TrackCatalogue:
+    """Every track we have resolved on Spotify, searchable by approximate name.
+
+    Each track is indexed under its Spotify artist/title and every spelling
+    that resolved to it, by character trigrams of the normalized strings.
+    `match` finds candidates through the title trigram postings and scores
+    them with the same title/artist weighting as track_matcher, so spelling
+    variants ("ft.", brackets, suffixes, typos) of a known song resolve from
+    memory. Trigrams only shortlist titles: the title must also be the same
+    word for word, up to a misspelled word or so, so a known artist cannot
+    carry a different song of theirs over the threshold.
+    Tracks are persisted in the `track_catalogue` collection, expire `ttl`
+    seconds after they were last resolved on Spotify and are reloaded
+    incrementally, which also picks up tracks resolved by other workers.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.threshold = float(os.environ.get('TRACK_CATALOGUE_THRESHOLD', '0.85'))
+        self.min_title = float(os.environ.get('TRACK_CATALOGUE_MIN_TITLE', '0.6'))
+        self.ttl = int(os.environ.get('TRACK_CATALOGUE_TTL', str(30 * 24 * 3600)))
+        self.max_tracks = int(os.environ.get('TRACK_CATALOGUE_SIZE', '20000'))
+        self.max_candidates = int(os.environ.get('TRACK_CATALOGUE_CANDIDATES', '25'))
+        self.reload_interval = float(os.environ.get('TRACK_CATALOGUE_RELOAD', '300'))
+        # track id -> (track, expires_at as a unix timestamp)
+        self.tracks: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._track_aliases: Dict[str, Set[Tuple[str, str]]] = {}
+        self._rows: List[_Row] = []
+        self._aliases: Set[Tuple[str, str, str]] = set()
+        self._postings: Dict[str, List[int]] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        # 'hit' | 'miss' -> count
+        self.stats: Counter = Counter()
+
+    @staticmethod
+    def track_id(track: Dict[str, Any]) -> str:
+        return TrackCache.make_key(track.get('artist') or '', track.get('title') or '')
+
+    async def ensure_indexes(self):
+        await self.collection.create_index('updated_at')
+        # Mongo removes documents once expires_at has passed
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def _index(self, track_id: str, artist: str, title: str):
+        artist_form, title_form = catalogue_form(artist), catalogue_form(title)
+        alias = (track_id, artist_form, title_form)
+        if not title_form or alias in self._aliases:
+            return
+        self._aliases.add(alias)
+        row = _Row(track_id, set(title_form.split()), trigrams(title_form), trigrams(artist_form),
+                   tokens(title) & VERSION_MARKERS)
+        self._rows.append(row)
+        for gram in row.title_grams:
+            self._postings.setdefault(gram, []).append(len(self._rows) - 1)
+
+    def _remember(self, track: Dict[str, Any], aliases: List[Tuple[str, str]], expires_at: float) -> Optional[str]:
+        track_id = self.track_id(track)
+        if track_id not in self.tracks and len(self.tracks) >= self.max_tracks:
+            return None
+        self.tracks[track_id] = (track, expires_at)
+        known = self._track_aliases.setdefault(track_id, set())
+        for artist, title in [(track.get('artist') or '', track.get('title') or '')] + aliases:
+            known.add((artist, title))
+            self._index(track_id, artist, title)
+        return track_id
+
+    def prune(self):
+        """Drop expired tracks and rebuild the index without them"""
+        now = time.time()
+        expired = [track_id for track_id, (_, expires_at) in self.tracks.items() if expires_at <= now]
+        if not expired:
+            return
+        for track_id in expired:
+            del self.tracks[track_id]
+            del self._track_aliases[track_id]
+        self._rows, self._aliases, self._postings = [], set(), {}
+        for track_id, aliases in self._track_aliases.items():
+            for artist, title in aliases:
+                self._index(track_id, artist, title)
+        logger.info(f'Pruned {len(expired)} expired tracks from the catalogue')
+
+    def match(self, artist: str, title: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (track, confidence) for the best catalogued track scoring at least the threshold"""
+        title_form = catalogue_form(title)
+        title_words = set(title_form.split())
+        title_grams = trigrams(title_form)
+        shared: Counter = Counter()
+        for gram in title_grams:
+            for row_id in self._postings.get(gram, ()):
+                shared[row_id] += 1
+
+        artist_grams = trigrams(catalogue_form(artist))
+        versions = tokens(title) & VERSION_MARKERS
+        now = time.time()
+        best, best_score = None, self.threshold
+        for row_id, common in shared.most_common(self.max_candidates):
+            row = self._rows[row_id]
+            title_score = 2 * common / (len(title_grams) + len(row.title_grams))
+            if title_score < self.min_title:
+                continue
+            typos = word_typos(title_words, row.title_words)
+            if typos is None or typos > max(1, len(title_words) // WORDS_PER_TYPO):
+                continue
+            if self.tracks[row.track_id][1] <= now:
+                continue
+            # Trigrams punish a typo in a short title hard; the word check has vouched for it
+            title_score = max(title_score, 1 - TYPO_COST * typos)
+            score = TITLE_WEIGHT * title_score + ARTIST_WEIGHT * dice(artist_grams, row.artist_grams)
+            if row.versions != versions:
+                score -= VERSION_PENALTY
+            if score >= best_score:
+                best, best_score = row, score
+
+        if best is None:
+            self.stats['miss'] += 1
+            return None
+        self.stats['hit'] += 1
+        return self.tracks[best.track_id][0], best_score
+
+    async def add(self, artist: str, title: str, track: Dict[str, Any]):
+        """Catalogue a track resolved for the searched artist/title"""
+        now = datetime.utcnow()
+        track_id = self._remember(track, [(artist, title)], time.time() + self.ttl)
+        if track_id is None:
+            return
+        try:
+            await self.collection.update_one(
+                {'_id': track_id},
+                {
+                    '$set': {'track': track, 'updated_at': now, 'expires_at': now + timedelta(seconds=self.ttl)},
+                    '$addToSet': {'aliases': {'artist': artist, 'title': title}},
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f'Track catalogue write failed for "{track_id}": {e}')
+
+    async def load(self):
+        """Index tracks added or updated since the last load"""
+        query = {'updated_at': {'$gt': self._loaded_until}} if self._loaded_until else {}
+        loaded = 0
+        async for doc in self.collection.find(query).sort('updated_at', 1):
+            aliases = [(a.get('artist') or '', a.get('title') or '') for a in doc.get('aliases', [])]
+            expires_at = doc.get('expires_at') or doc['updated_at'] + timedelta(seconds=self.ttl)
+            # Stored dates are naive UTC
+            remaining = (expires_at - datetime.utcnow()).total_seconds()
+            if remaining > 0 and self._remember(doc['track'], aliases, time.time() + remaining) is not None:
+                loaded += 1
+            self._loaded_until = doc['updated_at']
+        if loaded:
+            logger.info(f'Loaded {loaded} tracks into the catalogue ({len(self.tracks)} total)')
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+                self.prune()
+            except Exception as e:
+                logger.error(f'Track catalogue reload failed: {e}')
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,88 @@
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Weights for the combined score; title matters more because the station's
+# artist strings are often abbreviated or list featured artists differently
+TITLE_WEIGHT = 0.65
+ARTIST_WEIGHT = 0.35
+
+# Candidates below this combined score, or matching less than this share of
+# the searched title's words, are rejected
+MATCH_THRESHOLD = 0.45
+MIN_TITLE_RECALL = 0.5
+
+# Alternate versions we should not pick unless the searched title asks for them
+VERSION_MARKERS = {
+    'remix', 'live', 'karaoke', 'instrumental', 'acoustic', 'cover',
+    'tribute', 'acapella', 'sped', 'slowed', 'reverb', 'nightcore',
+}
+VERSION_PENALTY = 0.3
+
+# Words that carry no identity ("Song (feat. X)" vs "Song")
+IGNORED_TOKENS = {'feat', 'ft', 'featuring', 'with', 'the', 'a'}
+
+
+def normalize(s: str) -> str:
+    s = s.lower()
+    # Remove common separators and special chars
+    s = re.sub(r'[&,\-\+\(\)\[\]\'"./!?:]', ' ', s)
+    # Remove extra whitespace
+    return ' '.join(s.split())
+
+
+def tokens(s: str) -> Set[str]:
+    return set(normalize(s).split()) - IGNORED_TOKENS
+
+
+def core_tokens(s: str) -> Set[str]:
+    """Tokens outside parentheses/brackets, e.g. dropping "(feat. ...)" or "[Live]" """
+    stripped = re.sub(r'\([^)]*\)|\[[^\]]*\]', ' ', s)
+    return tokens(stripped) or tokens(s)
+
+
+def _similarity(wanted: Set[str], found: Set[str]) -> Tuple[float, float]:
+    """Return (weighted similarity, recall) of two token sets"""
+    if not wanted or not found:
+        return 0.0, 0.0
+    common = len(wanted & found)
+    recall = common / len(wanted)
+    precision = common / len(found)
+    return 0.75 * recall + 0.25 * precision, recall
+
+
+def score_candidate(track: Dict[str, Any], artist: str, title: str) -> float:
+    """Score a raw Spotify track object against the searched artist/title (0 = reject)"""
+    wanted_title = tokens(title)
+    found_title = tokens(track.get('name') or '')
+    title_score, title_recall = _similarity(core_tokens(title), core_tokens(track.get('name') or ''))
+    if title_recall < MIN_TITLE_RECALL:
+        return 0.0
+
+    found_artist: Set[str] = set()
+    for a in track.get('artists', []):
+        found_artist |= tokens(a.get('name') or '')
+    artist_score, _ = _similarity(tokens(artist), found_artist)
+
+    score = TITLE_WEIGHT * title_score + ARTIST_WEIGHT * artist_score
+
+    # Version markers must agree both ways: no remix unless asked, the remix if asked
+    mismatched_versions = (found_title ^ wanted_title) & VERSION_MARKERS
+    score -= VERSION_PENALTY * len(mismatched_versions)
+    return max(score, 0.0)
+
+
+def best_candidate(tracks: List[Dict[str, Any]], artist: str, title: str,
+                   threshold: float = MATCH_THRESHOLD) -> Optional[Tuple[Dict[str, Any], float]]:
+    """Rank every candidate and return (track, score) for the best one that clears the threshold
+
+    Ties keep Spotify's own ordering, which already favours popular tracks.
+    """
+    best = None
+    best_score = threshold
+    for track in tracks:
+        score = score_candidate(track, artist, title)
+        if score > best_score or (best is None and score >= threshold):
+            best, best_score = track, score
+    if best is None:
+        return None
+    return best, best_score
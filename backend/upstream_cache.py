@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+class CacheEntry:
+    __slots__ = ('value', 'fetched_at', 'memo')
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        # Things derived from `value` (e.g. its serialized response), dropped with it
+        self.memo: Dict[str, Any] = {}
+
+
+class UpstreamCache:
+    """Coalescing TTL cache in front of the upstream proxy endpoints.
+
+    - Concurrent misses for the same key share a single in-flight fetch.
+    - Values are fresh for `ttl` seconds.
+    - For a further `stale_ttl` seconds the last good value is served
+      immediately while one background refresh runs.
+    - If a fetch fails, the last good value (however old) is served.
+
+    Fetchers must raise on failure so error payloads are never cached.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, CacheEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # (key prefix, 'hit' | 'stale' | 'miss') -> count
+        self.stats: Counter = Counter()
+
+    async def get(self, key: str, fetcher: Fetcher, ttl: float, stale_ttl: float = 0) -> Any:
+        name = key.split(':', 1)[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < ttl:
+                self.stats[(name, 'hit')] += 1
+                return entry.value
+            if age < ttl + stale_ttl:
+                self.stats[(name, 'stale')] += 1
+                self._refresh(key, fetcher)
+                return entry.value
+
+        self.stats[(name, 'miss')] += 1
+
+        try:
+            return await asyncio.shield(self._refresh(key, fetcher))
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f'Serving stale "{key}" after upstream error: {e}')
+            return entry.value
+
+    async def refresh(self, key: str, fetcher: Fetcher) -> Any:
+        """Fetch now regardless of freshness (joining an in-flight fetch if there is one)"""
+        return await asyncio.shield(self._refresh(key, fetcher))
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return the last good value for a key without fetching"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def memo(self, key: str) -> Optional[Dict[str, Any]]:
+        """Scratch space tied to the current value of `key`, replaced along with it"""
+        entry = self._entries.get(key)
+        return entry.memo if entry is not None else None
+
+    def put(self, key: str, value: Any):
+        self._entries[key] = CacheEntry(value, time.monotonic())
+
+    def invalidate(self, prefix: str = ''):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def _refresh(self, key: str, fetcher: Fetcher) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fetcher))
+            # Background refreshes may have no awaiter; mark failures as retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, fetcher: Fetcher) -> Any:
+        try:
+            value = await fetcher()
+            self.put(key, value)
+            return value
+        except Exception as e:
+            logger.error(f'Upstream refresh for "{key}" failed: {e}')
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+# Create a singleton instance
+upstream_cache = UpstreamCache()
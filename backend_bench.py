@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+TruckSimFM Backend Benchmark
+Starts backend/server.py against the local upstream mocks in backend_mocks.py,
+drives concurrent load at each endpoint and reports p50/p95/p99 latency,
+throughput and upstream calls per request. The backend runs against an
+in-memory MongoDB (mongomock-motor) by default, so a fresh checkout can run
+it; pass --mongo-url to use a real MongoDB (its own throwaway database).
+
+    python backend_bench.py                      # run and compare to the baseline
+    python backend_bench.py --update-baseline    # run and store a new baseline
+
+The committed backend_bench_baseline.json was recorded with the defaults
+(`python backend_bench.py --update-baseline`); regenerate it the same way
+after an intended performance change, on the machine that runs the checks.
+
+Exits 1 if any endpoint regressed against the stored baseline, or if there
+is no baseline (entry) to compare with.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from backend_mocks import SONGS, MockUpstreams
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+BASELINE_FILE = ROOT_DIR / "backend_bench_baseline.json"
+BENCH_DB_NAME = "trucksim_bench"
+
+# Latency regressions smaller than this (ms) are treated as noise
+MIN_LATENCY_DELTA_MS = 5.0
+# Allowed absolute increase in upstream calls per request and in error rate
+MAX_UPSTREAM_DELTA = 0.05
+MAX_ERROR_RATE_DELTA = 0.01
+
+
+class Scenario:
+    """One endpoint under load; `body(i)` builds the JSON body of the i-th request
+    and `prepare(client)` sets up the data it reads, once before the load"""
+
+    def __init__(self, name, method, path, body=None, prepare=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+
+    def request_kwargs(self, i):
+        kwargs = {}
+        if self.body is not None:
+            kwargs["json"] = self.body(i)
+        return kwargs
+
+
+def _song(i):
+    artist, title = SONGS[i % len(SONGS)]
+    return {"artist": artist, "title": title}
+
+
+def _song_batch(i):
+    return {"items": [_song(i + j) for j in range(len(SONGS))]}
+
+
+async def _seed_status_checks(client, count=500):
+    """A fixed data set, so read latency does not depend on how many writes ran before"""
+    for start in range(0, count, 50):
+        await asyncio.gather(*(
+            client.post("/api/status", json={"client_name": f"seed-{i}"})
+            for i in range(start, min(start + 50, count))
+        ))
+
+
+SCENARIOS = [
+    Scenario("current-song", "GET", "/api/current-song"),
+    Scenario("now-playing", "GET", "/api/now-playing"),
+    Scenario("live-presenter", "GET", "/api/live-presenter"),
+    Scenario("schedule", "GET", "/api/schedule"),
+    Scenario("schedule-now", "GET", "/api/schedule/now"),
+    Scenario("schedule-next", "GET", "/api/schedule/next?count=5"),
+    Scenario("recently-played", "GET", "/api/recently-played?limit=20"),
+    Scenario("recently-played-enriched", "GET", "/api/recently-played?limit=20&enrich=true"),
+    Scenario("spotify-search", "POST", "/api/spotify/search", body=_song),
+    Scenario("spotify-search-batch", "POST", "/api/spotify/search/batch", body=_song_batch),
+    Scenario("status-read", "GET", "/api/status?limit=50", prepare=_seed_status_checks),
+    Scenario("status-write", "POST", "/api/status", body=lambda i: {"client_name": f"bench-{i}"}),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_scenario(client, mocks, scenario, concurrency, duration):
+    """Hammer one endpoint with `concurrency` workers for `duration` seconds"""
+    if scenario.prepare is not None:
+        await scenario.prepare(client)
+    # Warm-up request so cold caches do not dominate the percentiles
+    await client.request(scenario.method, scenario.path, **scenario.request_kwargs(0))
+
+    latencies = []
+    errors = 0
+    counter = 0
+    calls_before = mocks.total_calls()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, counter
+        while time.perf_counter() < deadline:
+            counter += 1
+            kwargs = scenario.request_kwargs(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = len(latencies) + errors
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "upstream_per_request": (mocks.total_calls() - calls_before) / total if total else 0.0,
+    }
+
+
+def start_server(urls, args, port):
+    env = dict(os.environ)
+    env.update(urls)
+    env.update({
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": BENCH_DB_NAME,
+        "SPOTIFY_CLIENT_ID": "bench",
+        "SPOTIFY_CLIENT_SECRET": "bench",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(client, server, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server.py exited with code {server.returncode}")
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server.py did not become ready in time")
+
+
+def in_memory(mongo_url):
+    return mongo_url.startswith("mongomock://")
+
+
+async def wait_until_settled(client, timeout=60.0):
+    """Wait for the start-up work (warm-up, Spotify prefetch) that would compete with the load"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        warmup = (await client.get("/ready")).json()["warmup"]
+        metrics = (await client.get("/metrics")).text
+        if warmup["done"] and "\nspotify_prefetch_queue_depth 0" in metrics:
+            break
+        await asyncio.sleep(0.5)
+    # Lookups taken off the queue may still be finishing
+    await asyncio.sleep(2)
+
+
+def drop_bench_database(mongo_url):
+    if in_memory(mongo_url):
+        # Lives in the server process and goes away with it
+        return
+    from pymongo import MongoClient
+    client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        client.drop_database(BENCH_DB_NAME)
+    finally:
+        client.close()
+
+
+def print_report(results):
+    header = f"{'endpoint':<26}{'reqs':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'upstream/req':>14}"
+    print("\n" + header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<26}{r['requests']:>8}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['upstream_per_request']:>14.3f}")
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages (empty if none)"""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            regressions.append(f"{name}: no baseline entry (record one with --update-baseline --only {name})")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = max(base[metric] * (1 + tolerance), base[metric] + MIN_LATENCY_DELTA_MS)
+            if r[metric] > limit:
+                regressions.append(f"{name}: {metric} {r[metric]:.1f} > {limit:.1f} (baseline {base[metric]:.1f})")
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {r['rps']:.1f} req/s < {base['rps'] * (1 - tolerance):.1f} (baseline {base['rps']:.1f})")
+        if r["upstream_per_request"] > base["upstream_per_request"] + MAX_UPSTREAM_DELTA:
+            regressions.append(f"{name}: upstream calls/request {r['upstream_per_request']:.3f} (baseline {base['upstream_per_request']:.3f})")
+        if r["error_rate"] > base["error_rate"] + MAX_ERROR_RATE_DELTA:
+            regressions.append(f"{name}: error rate {r['error_rate']:.3f} (baseline {base['error_rate']:.3f})")
+    return regressions
+
+
+async def main(args):
+    selected = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    mocks = MockUpstreams(args.latency, args.jitter, args.error_rate)
+    urls = await mocks.start()
+    drop_bench_database(args.mongo_url)
+
+    port = free_port()
+    server = start_server(urls, args, port)
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await wait_until_ready(client, server)
+            await wait_until_settled(client)
+            for scenario in selected:
+                print(f"Running {scenario.name} ({args.concurrency} concurrent, {args.duration:.0f}s)...")
+                results[scenario.name] = await run_scenario(client, mocks, scenario, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        await mocks.stop()
+        drop_bench_database(args.mongo_url)
+
+    print_report(results)
+    settings = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "mongo": "in-memory" if in_memory(args.mongo_url) else "mongodb",
+    }
+
+    if args.update_baseline:
+        baseline = {"settings": settings, "results": results}
+        if args.only and args.baseline.exists():
+            previous = json.loads(args.baseline.read_text())
+            baseline["results"] = {**previous.get("results", {}), **results}
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        # Without a baseline nothing is checked, so don't report success
+        print(f"\n❌ No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 1
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("settings") != settings:
+        print(f"\n⚠️  Baseline was recorded with different settings: {baseline.get('settings')}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Performance regressions:")
+        for message in regressions:
+            print(f"  - {message}")
+        return 1
+    print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongomock://",
+                        help="MongoDB to run the backend against (default: in-memory)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per endpoint")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Mock upstream extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock upstream calls failing with 503")
+    # Load generator, mocks and server share the machine: runs differ by up to ~30%
+    # on a single core, so only larger shifts count (upstream calls are checked exactly)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative latency/throughput regression")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--only", nargs="*", help="Run only these endpoints")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's log output")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+TruckSimFM Upstream Mocks
+Local stand-ins for the Shoutcast (/currentsong and an ICY radio.mp3 stream),
+Strapi and Spotify APIs with configurable latency and error injection. Used by
+backend_bench.py, or run on its own:
+
+    python backend_mocks.py --latency 0.05 --error-rate 0.01
+
+and start the backend with the printed environment variables.
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import socket
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+SONGS = [
+    ("Calvin Harris", "Blessings"),
+    ("Dua Lipa", "Levitating"),
+    ("The Weeknd", "Blinding Lights"),
+    ("Daft Punk", "One More Time"),
+    ("Avicii", "Wake Me Up"),
+    ("Coldplay", "Viva La Vida"),
+    ("Queen", "Don't Stop Me Now"),
+    ("Kygo feat. Whitney Houston", "Higher Love"),
+    ("Eurythmics", "Sweet Dreams (Are Made of This)"),
+    ("Fleetwood Mac", "Dreams - 2004 Remaster"),
+]
+PRESENTERS = ["DJ Bob", "Trucker Tina", "Night Owl"]
+# ICY stream shape: metadata every ICY_METAINT audio bytes at 128 kbit/s
+ICY_METAINT = 8192
+ICY_BYTES_PER_SECOND = 16000
+
+
+class Upstream:
+    """Latency/error injection and call accounting for one mock service"""
+
+    def __init__(self, name, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.errors = 0
+
+    def route(self, path, endpoint, methods=("GET",)):
+        async def handler(request: Request):
+            self.calls[path] += 1
+            delay = self.latency + random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                return PlainTextResponse("Injected failure", status_code=503)
+            return await endpoint(request)
+        return Route(path, handler, methods=list(methods))
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class MockUpstreams:
+    """The four upstream services, each on its own local port"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, song_interval=30.0, history_size=500):
+        self.radio = Upstream("radio", latency, jitter, error_rate)
+        self.strapi = Upstream("strapi", latency, jitter, error_rate)
+        self.accounts = Upstream("spotify-accounts", latency, jitter, error_rate)
+        self.spotify = Upstream("spotify-api", latency, jitter, error_rate)
+        self.song_interval = song_interval
+        self.started_at = time.time()
+        self.likes = {}
+        self.history = self._build_history(history_size)
+        self.schedule = self._build_schedule()
+        self._servers = []
+        self.urls = {}
+        # Bumped by drop_streams() to end every open radio.mp3 response
+        self._stream_generation = 0
+
+    @property
+    def upstreams(self):
+        return [self.radio, self.strapi, self.accounts, self.spotify]
+
+    def total_calls(self):
+        return sum(upstream.total_calls for upstream in self.upstreams)
+
+    def stats(self):
+        return {
+            upstream.name: {"calls": dict(upstream.calls), "errors": upstream.errors}
+            for upstream in self.upstreams
+        }
+
+    # --- Data -------------------------------------------------------------
+
+    def current_song(self):
+        index = int((time.time() - self.started_at) // self.song_interval)
+        return SONGS[index % len(SONGS)]
+
+    def _build_history(self, size):
+        now = datetime.now(timezone.utc)
+        history = []
+        for i in range(size):
+            artist, song = SONGS[i % len(SONGS)]
+            presenter = PRESENTERS[i % len(PRESENTERS)] if i % 4 else None
+            history.append({
+                "id": size - i,
+                "documentId": f"doc{size - i}",
+                "artist": artist,
+                "song": song,
+                "artwork_url": None,
+                "played_datetime": (now - timedelta(minutes=4 * i)).isoformat().replace("+00:00", "Z"),
+                "likes": i % 7,
+                "played_by": {
+                    "username": presenter,
+                    "profile_photo": {"url": f"/uploads/{presenter.replace(' ', '_')}.png"},
+                } if presenter else None,
+            })
+        return history
+
+    @staticmethod
+    def _build_schedule():
+        monday = datetime(2026, 1, 5, tzinfo=timezone.utc)
+        shows = []
+        for day in range(7):
+            for slot, presenter in enumerate(PRESENTERS):
+                start = monday + timedelta(days=day, hours=6 + slot * 6)
+                shows.append({
+                    "id": len(shows) + 1,
+                    "show_name": f"{presenter}'s Drive",
+                    "description": "Mock show",
+                    "start_time": start.isoformat().replace("+00:00", ".000Z"),
+                    "end_time": (start + timedelta(hours=4)).isoformat().replace("+00:00", ".000Z"),
+                    "permanent": True,
+                    "perm_end": None,
+                    "excluded_dates": [],
+                    "users_permissions_user": {
+                        "username": presenter,
+                        "profile_photo": {"url": f"/uploads/{presenter.replace(' ', '_')}.png"},
+                    },
+                })
+        return shows
+
+    # --- Handlers ---------------------------------------------------------
+
+    async def _currentsong(self, request):
+        artist, title = self.current_song()
+        return PlainTextResponse(f"{artist} - {title}")
+
+    async def _radio_stream(self, request):
+        """Silent MP3 stream; with Icy-MetaData: 1 a StreamTitle block follows every
+        ICY_METAINT audio bytes (empty unless the title changed, like Shoutcast)"""
+        icy = request.headers.get("icy-metadata") == "1"
+
+        generation = self._stream_generation
+
+        async def body():
+            audio = bytes(ICY_METAINT)
+            sent_title = None
+            while generation == self._stream_generation:
+                yield audio
+                if icy:
+                    artist, title = self.current_song()
+                    stream_title = f"{artist} - {title}"
+                    if stream_title != sent_title:
+                        sent_title = stream_title
+                        meta = f"StreamTitle='{stream_title}';StreamUrl='';".encode()
+                        meta += bytes(-len(meta) % 16)
+                        yield bytes([len(meta) // 16]) + meta
+                    else:
+                        yield b"\0"
+                await asyncio.sleep(ICY_METAINT / ICY_BYTES_PER_SECOND)
+
+        headers = {"icy-name": "TruckSimFM Mock", "icy-br": "128"}
+        if icy:
+            headers["icy-metaint"] = str(ICY_METAINT)
+        return StreamingResponse(body(), media_type="audio/mpeg", headers=headers)
+
+    async def _playlists(self, request):
+        limit = int(request.query_params.get("pagination[limit]", "25"))
+        start = int(request.query_params.get("pagination[start]", "0"))
+        # The newest entry is the song on air now
+        artist, title = self.current_song()
+        head = dict(self.history[0], artist=artist, song=title)
+        items = [head] + self.history[1:]
+        page = [dict(item, likes=self.likes.get(item["documentId"], item["likes"]))
+                for item in items[start:start + limit]]
+        return JSONResponse({"data": page, "meta": {"pagination": {"start": start, "limit": limit, "total": len(items)}}})
+
+    async def _playlist(self, request):
+        document_id = request.path_params["document_id"]
+        if request.method == "PUT":
+            body = await request.json()
+            self.likes[document_id] = body.get("data", {}).get("likes", 0)
+        return JSONResponse({"data": {"documentId": document_id, "likes": self.likes.get(document_id, 0)}})
+
+    async def _schedules(self, request):
+        return JSONResponse({"data": self.schedule, "meta": {}})
+
+    async def _token(self, request):
+        return JSONResponse({"access_token": "mock-token", "token_type": "Bearer", "expires_in": 3600})
+
+    async def _search(self, request):
+        query = request.query_params.get("q", "")
+        artist = re.search(r'artist:"?([^"]+?)"?(?: track:|$)', query)
+        title = re.search(r'track:"?([^"]+?)"?$', query)
+        name = title.group(1) if title else query
+        artists = [{"name": artist.group(1)}] if artist else [{"name": query}]
+        track = {
+            "name": name,
+            "artists": artists,
+            "album": {
+                "name": f"{name} (Single)",
+                "release_date": "2020-01-01",
+                "images": [{"url": f"https://i.scdn.co/image/{size}"} for size in ("640", "300", "64")],
+            },
+            "external_urls": {"spotify": "https://open.spotify.com/track/mock"},
+            "duration_ms": 200000,
+            "preview_url": None,
+        }
+        return JSONResponse({"tracks": {"items": [track]}})
+
+    def apps(self):
+        return {
+            "RADIO_BASE_URL": Starlette(routes=[
+                self.radio.route("/currentsong", self._currentsong),
+                self.radio.route("/radio.mp3", self._radio_stream),
+            ]),
+            "STRAPI_BASE_URL": Starlette(routes=[
+                self.strapi.route("/api/playlists", self._playlists),
+                self.strapi.route("/api/playlists/{document_id}", self._playlist, methods=("GET", "PUT")),
+                self.strapi.route("/api/schedules", self._schedules),
+            ]),
+            "SPOTIFY_ACCOUNTS_URL": Starlette(routes=[
+                self.accounts.route("/api/token", self._token, methods=("POST",)),
+            ]),
+            "SPOTIFY_API_URL": Starlette(routes=[
+                self.spotify.route("/v1/search", self._search),
+            ]),
+        }
+
+    def drop_streams(self):
+        """End every open radio.mp3 stream, as a Shoutcast restart would"""
+        self._stream_generation += 1
+
+    # --- Lifecycle --------------------------------------------------------
+
+    async def start(self, host="127.0.0.1"):
+        """Serve every mock on a free port; returns the base URL env vars for the backend"""
+        for env_name, app in self.apps().items():
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, 0))
+            server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+            task = asyncio.create_task(server.serve(sockets=[sock]))
+            self._servers.append((server, task))
+            self.urls[env_name] = f"http://{host}:{sock.getsockname()[1]}"
+        while not all(server.started for server, _ in self._servers):
+            await asyncio.sleep(0.05)
+        return dict(self.urls)
+
+    async def stop(self):
+        for server, _ in self._servers:
+            server.should_exit = True
+            # Don't wait for open radio.mp3 streams to finish
+            server.force_exit = True
+        await asyncio.gather(*(task for _, task in self._servers), return_exceptions=True)
+        self._servers = []
+
+
+async def serve_forever(args):
+    mocks = MockUpstreams(args.latency, args.jitter, args.error_rate, args.song_interval)
+    urls = await mocks.start()
+    for name, url in urls.items():
+        print(f"{name}={url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mocks.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="Base latency per upstream call (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra uniform random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    parser.add_argument("--song-interval", type=float, default=30.0, help="Seconds between song changes")
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other by bare name, as when run from backend/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'backend')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def db():
+    """An in-memory Motor database"""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()['test']
+
+
+@pytest.fixture
+def upstream_client():
+    """The shared upstream HTTP client, reset after the test"""
+    from http_client import http_client
+    yield http_client
+    # The client and its per-host limits belong to the test's event loop
+    http_client._client = None
+    http_client._host_limits.clear()
+
+
+@pytest.fixture
+def server(upstream_client):
+    """The FastAPI app module, importable without a running MongoDB"""
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'test')
+    import server
+    return server
@@ -0,0 +1,213 @@
+import asyncio
+
+import httpx
+
+from backend_mocks import ICY_METAINT, MockUpstreams
+from icy_listener import IcyListener, IcyMetadataParser, parse_stream_title
+
+
+def metadata(text: str) -> bytes:
+    """One ICY metadata block: length byte (x16) and the NUL-padded text"""
+    meta = text.encode()
+    meta += bytes(-len(meta) % 16)
+    return bytes([len(meta) // 16]) + meta
+
+
+def stream(*titles: str, metaint: int = 8) -> bytes:
+    """`metaint` audio bytes before each title's block; None sends an empty block"""
+    out = b''
+    for title in titles:
+        out += bytes(metaint)
+        out += b'\0' if title is None else metadata(f"StreamTitle='{title}';StreamUrl='';")
+    return out
+
+
+def titles(blocks):
+    return [parse_stream_title(block) for block in blocks]
+
+
+def test_parse_stream_title():
+    assert parse_stream_title(b"StreamTitle='Queen - Bohemian Rhapsody';StreamUrl='';\0\0\0") == \
+        'Queen - Bohemian Rhapsody'
+    assert parse_stream_title(b"StreamTitle='Queen - Bohemian Rhapsody';") == 'Queen - Bohemian Rhapsody'
+    assert parse_stream_title(b"StreamUrl='http://example.com';") is None
+    assert parse_stream_title(b'\0' * 16) is None
+
+
+def test_parse_stream_title_with_quote_semicolon_inside():
+    block = metadata("StreamTitle='Guns N';Roses - Don';t Cry';StreamUrl='';")[1:]
+    assert parse_stream_title(block) == "Guns N';Roses - Don';t Cry"
+    block = metadata("StreamTitle='Rock';n Roll - It's Over';")[1:]
+    assert parse_stream_title(block) == "Rock';n Roll - It's Over"
+
+
+def test_parse_stream_title_latin1_fallback():
+    block = "StreamTitle='Beyoncé - Halo';".encode('latin-1')
+    assert parse_stream_title(block) == 'Beyoncé - Halo'
+
+
+def test_parser_whole_stream():
+    parser = IcyMetadataParser(8)
+    assert titles(parser.feed(stream('A - One', 'B - Two'))) == ['A - One', 'B - Two']
+
+
+def test_parser_skips_empty_blocks():
+    parser = IcyMetadataParser(8)
+    assert titles(parser.feed(stream(None, 'A - One', None, None, 'B - Two', None))) == ['A - One', 'B - Two']
+
+
+def test_parser_byte_at_a_time():
+    data = stream('A - One', None, "Guns N';Roses - Don';t Cry")
+    parser = IcyMetadataParser(8)
+    blocks = []
+    for i in range(len(data)):
+        blocks += parser.feed(data[i:i + 1])
+    assert titles(blocks) == ['A - One', "Guns N';Roses - Don';t Cry"]
+
+
+def test_parser_split_at_every_boundary():
+    data = stream('A - One', None, 'B - Two', metaint=16)
+    expected = ['A - One', 'B - Two']
+    # Every split point: in the audio, on the length byte and inside the metadata
+    for cut in range(len(data) + 1):
+        parser = IcyMetadataParser(16)
+        blocks = parser.feed(data[:cut]) + parser.feed(data[cut:])
+        assert titles(blocks) == expected, cut
+
+
+def test_parser_split_right_after_length_byte():
+    block = metadata("StreamTitle='A - One';")
+    parser = IcyMetadataParser(4)
+    assert parser.feed(bytes(4) + block[:1]) == []
+    assert parser.feed(block[1:10]) == []
+    assert titles(parser.feed(block[10:] + bytes(4) + b'\0')) == ['A - One']
+
+
+def test_mock_radio_stream():
+    async def run():
+        mocks = MockUpstreams()
+        env = await mocks.start()
+        try:
+            async with httpx.AsyncClient() as client:
+                async with client.stream(
+                    'GET', f"{env['RADIO_BASE_URL']}/radio.mp3", headers={'Icy-MetaData': '1'}, timeout=5
+                ) as response:
+                    assert response.headers['icy-metaint'] == str(ICY_METAINT)
+                    parser = IcyMetadataParser(int(response.headers['icy-metaint']))
+                    # Odd-sized reads so chunks straddle the audio/metadata boundaries
+                    async for chunk in response.aiter_bytes(1000):
+                        blocks = parser.feed(chunk)
+                        if blocks:
+                            return titles(blocks)[0], mocks.current_song()
+        finally:
+            await mocks.stop()
+
+    title, (artist, song) = asyncio.run(asyncio.wait_for(run(), 10))
+    assert title == f'{artist} - {song}'
+
+
+class Titles:
+    """on_title handler recording every call"""
+
+    def __init__(self):
+        self.calls = []
+        self.changed = asyncio.Event()
+
+    async def __call__(self, title):
+        self.calls.append(title)
+        self.changed.set()
+
+    async def next(self, timeout=5):
+        await asyncio.wait_for(self.changed.wait(), timeout)
+        self.changed.clear()
+
+
+async def wait_until(condition, timeout=5):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.02)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def listener_on(mocks_env, path, on_title):
+    listener = IcyListener(f"{mocks_env['RADIO_BASE_URL']}{path}", on_title)
+    listener.enabled = True
+    listener.retry_min = 0.05
+    listener.retry_max = 0.2
+    return listener
+
+
+def test_listener_reports_changes_and_reconnects():
+    song = ['Queen - Bohemian Rhapsody']
+
+    async def run():
+        mocks = MockUpstreams()
+        mocks.current_song = lambda: tuple(song[0].split(' - '))
+        env = await mocks.start()
+        titles = Titles()
+        listener = listener_on(env, '/radio.mp3', titles)
+        listener.start()
+        try:
+            await titles.next()
+            assert listener.connected
+
+            # A dropped stream: disconnected (callers poll) until the listener is back
+            mocks.drop_streams()
+            await wait_until(lambda: not listener.connected)
+            await wait_until(lambda: listener.connected)
+            # The new connection repeats the current title; that is not a change
+            await asyncio.sleep(0.6)
+            assert titles.calls == ['Queen - Bohemian Rhapsody']
+
+            song[0] = 'Dua Lipa - Levitating'
+            await titles.next()
+            assert titles.calls == ['Queen - Bohemian Rhapsody', 'Dua Lipa - Levitating']
+            assert listener.title == 'Dua Lipa - Levitating'
+        finally:
+            await listener.stop()
+            await mocks.stop()
+        assert not listener.connected
+
+    asyncio.run(asyncio.wait_for(run(), 20))
+
+
+def test_listener_without_icy_metadata_leaves_polling_on():
+    async def run():
+        mocks = MockUpstreams()
+        env = await mocks.start()
+        titles = Titles()
+        # /currentsong answers, but with no icy-metaint header
+        listener = listener_on(env, '/currentsong', titles)
+        listener.start()
+        try:
+            await wait_until(lambda: mocks.radio.calls['/currentsong'] >= 2)
+            assert not listener.connected
+            assert titles.calls == []
+        finally:
+            await listener.stop()
+            await mocks.stop()
+
+    asyncio.run(asyncio.wait_for(run(), 20))
+
+
+def test_current_song_polls_only_while_disconnected(server, monkeypatch):
+    async def run():
+        mocks = MockUpstreams()
+        mocks.current_song = lambda: ('Queen', 'Bohemian Rhapsody')
+        env = await mocks.start()
+        monkeypatch.setattr(server, 'RADIO_BASE_URL', env['RADIO_BASE_URL'])
+        listener = server.icy_listener
+        try:
+            monkeypatch.setattr(listener, 'connected', True)
+            monkeypatch.setattr(listener, 'title', 'Dua Lipa - Levitating')
+            assert await server._request_current_song() == 'Dua Lipa - Levitating'
+            assert mocks.radio.calls['/currentsong'] == 0
+
+            monkeypatch.setattr(listener, 'connected', False)
+            assert await server._request_current_song() == 'Queen - Bohemian Rhapsody'
+            assert mocks.radio.calls['/currentsong'] == 1
+        finally:
+            await server.http_client.aclose()
+            await mocks.stop()
+
+    asyncio.run(asyncio.wait_for(run(), 20))
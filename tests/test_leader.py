@@ -0,0 +1,95 @@
+import asyncio
+
+from leader import LeaderElection
+
+
+class Worker:
+    """A LeaderElection with recording hooks and a short lease"""
+
+    def __init__(self, collection, lease=0.3):
+        self.events = []
+        self.election = LeaderElection(collection, 'upstream-refresh', self.elected, self.demoted)
+        self.election.enabled = True
+        self.election.lease = lease
+        self.election.renew_interval = lease / 3
+
+    async def elected(self):
+        self.events.append('elected')
+
+    async def demoted(self):
+        self.events.append('demoted')
+
+
+async def wait_until(condition, timeout=3):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.02)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_only_one_worker_holds_the_lease(db):
+    a, b = Worker(db.leader_leases), Worker(db.leader_leases)
+
+    async def run():
+        assert await a.election.try_acquire()
+        assert not await b.election.try_acquire()
+        # Renewing our own lease keeps it
+        assert await a.election.try_acquire()
+        assert not await b.election.try_acquire()
+
+    asyncio.run(run())
+
+
+def test_expired_lease_is_taken_over(db):
+    a, b = Worker(db.leader_leases), Worker(db.leader_leases)
+
+    async def run():
+        a.election.start()
+        await wait_until(lambda: a.election.is_leader)
+        b.election.start()
+        await asyncio.sleep(0.4)
+        assert not b.election.is_leader
+
+        # The leader dies without releasing its lease: the other worker
+        # takes over once the lease has expired
+        a.election._task.cancel()
+        await wait_until(lambda: b.election.is_leader)
+        await b.election.stop()
+
+    asyncio.run(run())
+    assert a.events == ['elected']
+    assert b.events == ['elected', 'demoted']
+
+
+def test_stopping_leader_hands_over_at_once(db):
+    a, b = Worker(db.leader_leases, lease=30), Worker(db.leader_leases, lease=30)
+
+    async def run():
+        assert await a.election.try_acquire()
+        await a.election._set_leader(True)
+        await a.election.stop()
+        # Released, so there is no need to wait out the 30 s lease
+        assert await b.election.try_acquire()
+
+    asyncio.run(run())
+    assert a.events == ['elected', 'demoted']
+
+
+def test_leader_rides_out_a_mongo_blip_until_its_lease_ends(db):
+    a = Worker(db.leader_leases)
+
+    async def run():
+        a.election.start()
+        await wait_until(lambda: a.election.is_leader)
+
+        async def unreachable(*args, **kwargs):
+            raise ConnectionError('mongo unreachable')
+        a.election.collection = type('Down', (), {'find_one_and_update': unreachable})()
+        await asyncio.sleep(0.15)
+        still_leading = a.election.is_leader
+        await wait_until(lambda: not a.election.is_leader)
+        a.election._task.cancel()
+        return still_leading
+
+    assert asyncio.run(run())
+    assert a.events == ['elected', 'demoted']
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from likes import LikeAggregator
+
+
+class Upstream:
+    """Stand-in for the Strapi like count of each document"""
+
+    def __init__(self, likes=57, delay=0.0, fail=False):
+        self.likes = {}
+        self.initial = likes
+        self.delay = delay
+        self.fail = fail
+        self.reads = 0
+        self.writes = []
+
+    async def read(self, document_id):
+        self.reads += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return self.likes.get(document_id, self.initial)
+
+    async def write(self, document_id, likes):
+        self.writes.append((document_id, likes))
+        self.likes[document_id] = likes
+
+
+def test_first_like_does_not_wait_for_upstream(db):
+    upstream = Upstream(delay=2.0)
+    aggregator = LikeAggregator(db, upstream.read, upstream.write)
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(aggregator.record('doc1') for _ in range(20)))
+        elapsed = time.perf_counter() - started
+        for task in list(aggregator._base_reads.values()):
+            task.cancel()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    assert elapsed < 0.5
+    # Unknown base: no count is made up
+    assert results == [(None, True)] * 20
+    assert upstream.reads == 1
+
+
+def test_count_is_reported_once_the_base_is_known(db):
+    upstream = Upstream()
+    aggregator = LikeAggregator(db, upstream.read, upstream.write)
+
+    async def run():
+        first = await aggregator.record('doc1')
+        while aggregator._base_reads:
+            await asyncio.sleep(0.01)
+        return first, await aggregator.record('doc1')
+
+    first, second = asyncio.run(run())
+    assert first == (None, True)
+    assert second == (59, True)
+    assert aggregator.overlay('doc1', 57) == 59
+
+
+def test_failed_base_read_never_reports_a_low_count(db):
+    upstream = Upstream(fail=True)
+    aggregator = LikeAggregator(db, upstream.read, upstream.write)
+
+    async def run():
+        await aggregator.record('doc1')
+        while aggregator._base_reads:
+            await asyncio.sleep(0.01)
+        return await aggregator.record('doc1')
+
+    assert asyncio.run(run()) == (None, True)
+    assert aggregator.overlay('doc1', 57) == 57
+
+    # The flush sets the base from the upstream count it writes
+    upstream.fail = False
+
+    async def flush():
+        await aggregator.flush()
+        return await aggregator.record('doc1')
+    assert asyncio.run(flush()) == (60, True)
+    assert upstream.writes == [('doc1', 59)]
+
+
+def test_device_dedup(db):
+    upstream = Upstream()
+    aggregator = LikeAggregator(db, upstream.read, upstream.write)
+
+    async def run():
+        await aggregator.ensure_indexes()
+        await aggregator.record('doc1', 'phone')
+        while aggregator._base_reads:
+            await asyncio.sleep(0.01)
+        return await aggregator.record('doc1', 'phone'), await aggregator.record('doc1', 'tablet')
+
+    assert asyncio.run(run()) == ((58, False), (59, True))
+
+
+def test_device_records_expire(db):
+    aggregator = LikeAggregator(db, Upstream().read, Upstream().write)
+
+    async def run():
+        await aggregator.ensure_indexes()
+        return await db.song_like_devices.index_information()
+
+    ttl = [info for info in asyncio.run(run()).values() if 'expireAfterSeconds' in info]
+    assert [(info['key'], info['expireAfterSeconds']) for info in ttl] == [([('liked_at', 1)], aggregator.device_ttl)]
@@ -0,0 +1,108 @@
+import asyncio
+
+from playlist_history import PlaylistHistory
+
+
+def entry(i, likes=0):
+    return {
+        'id': i,
+        'documentId': f'doc{i}',
+        'artist': f'Artist {i}',
+        'song': f'Song {i}',
+        'artwork_url': None,
+        'played_at': f'2026-01-01T{i // 60:02d}:{i % 60:02d}:00Z',
+        'likes': likes,
+    }
+
+
+class Upstream:
+    """Newest-first playlist pages, like the Strapi proxy returns them"""
+
+    def __init__(self, count):
+        self.entries = [entry(i) for i in range(count, 0, -1)]
+
+    async def fetch_page(self, limit, start):
+        return self.entries[start:start + limit]
+
+
+def history_for(db, upstream, on_new=None):
+    history = PlaylistHistory(db.playlist_history, upstream.fetch_page, on_new)
+    history.page_size = 10
+    history.backfill_pages = 3
+    return history
+
+
+def test_keyset_pages_walk_the_history(db):
+    history = history_for(db, Upstream(25))
+
+    async def run():
+        await history.ensure_indexes()
+        await history.ingest()
+        await history.backfill()
+        pages, cursor = [], None
+        while True:
+            items, cursor = await history.page(10, cursor)
+            pages.append([item['id'] for item in items])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(run()) == [list(range(25, 15, -1)), list(range(15, 5, -1)), list(range(5, 0, -1))]
+
+
+def test_page_cursor(db):
+    history = history_for(db, Upstream(10))
+
+    async def run():
+        await history.ingest()
+        return await history.page(3), await history.page(3, before=8), await history.page(3, before=1)
+
+    first, middle, past_the_end = asyncio.run(run())
+    assert [item['id'] for item in first[0]] == [10, 9, 8] and first[1] == 8
+    assert [item['id'] for item in middle[0]] == [7, 6, 5] and middle[1] == 5
+    assert past_the_end == ([], None)
+    # Items come back as formatted, without Mongo internals
+    assert first[0][0] == entry(10)
+
+
+def test_reingest_deduplicates(db):
+    upstream = Upstream(5)
+    new_batches = []
+    history = history_for(db, upstream, on_new=lambda items: new_batches.append([i['id'] for i in items]))
+
+    async def run():
+        await history.ensure_indexes()
+        await history.ingest()
+        # Same entries again, one with an updated like count, plus two new plays
+        upstream.entries[0] = entry(5, likes=3)
+        await history.ingest()
+        upstream.entries[:0] = [entry(7), entry(6)]
+        await history.ingest()
+        return await db.playlist_history.count_documents({}), (await history.page(1))[0][0]
+
+    count, newest = asyncio.run(run())
+    assert count == 7
+    assert new_batches == [[5, 4, 3, 2, 1], [7, 6]]
+    assert history.latest_id == 7
+    assert newest['id'] == 7
+    assert asyncio.run(db.playlist_history.find_one({'id': 5}))['likes'] == 3
+
+
+def test_recently_played_clamps_the_limit(server, db, monkeypatch):
+    history = history_for(db, Upstream(80))
+    history.backfill_pages = 8
+    monkeypatch.setattr(server, 'playlist_history', history)
+
+    async def run():
+        await history.ingest()
+        await history.backfill()
+        return (
+            await server._recently_played_payload(limit=1000),
+            await server._recently_played_payload(limit=0),
+            await server._recently_played_payload(limit=5, before=50),
+        )
+
+    largest, smallest, older = asyncio.run(run())
+    assert len(largest['data']) == server.MAX_RECENTLY_PLAYED
+    assert largest['next_cursor'] == 80 - server.MAX_RECENTLY_PLAYED + 1
+    assert [item['id'] for item in smallest['data']] == [80]
+    assert [item['id'] for item in older['data']] == [49, 48, 47, 46, 45]
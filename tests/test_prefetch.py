@@ -0,0 +1,53 @@
+import asyncio
+
+from prefetch import PRIORITY_NOW_PLAYING, PRIORITY_PLAYLIST, PRIORITY_WARM, SpotifyPrefetcher
+
+
+def test_song_on_air_is_resolved_first(monkeypatch):
+    monkeypatch.setenv('SPOTIFY_PREFETCH_CONCURRENCY', '1')
+    resolved = []
+
+    async def resolve(pairs):
+        resolved.extend(pairs)
+        return [('found', {}) for _ in pairs]
+
+    async def run():
+        prefetcher = SpotifyPrefetcher(resolve)
+        prefetcher.submit('Queen', 'Bohemian Rhapsody', PRIORITY_WARM)
+        prefetcher.submit_many([('Dua Lipa', 'Levitating'), ('Avicii', 'Wake Me Up')], PRIORITY_PLAYLIST)
+        prefetcher.submit('The Weeknd', 'Blinding Lights', PRIORITY_NOW_PLAYING)
+        # Already queued: not queued twice
+        assert not prefetcher.submit('Dua Lipa', 'Levitating', PRIORITY_PLAYLIST)
+        prefetcher.start()
+        await asyncio.wait_for(prefetcher._queue.join(), 5)
+        await prefetcher.stop()
+        return prefetcher.stats
+
+    stats = asyncio.run(run())
+    assert resolved == [
+        ('The Weeknd', 'Blinding Lights'),
+        ('Dua Lipa', 'Levitating'),
+        ('Avicii', 'Wake Me Up'),
+        ('Queen', 'Bohemian Rhapsody'),
+    ]
+    assert stats == {'found': 4, 'deduplicated': 1}
+
+
+def test_leader_submits_the_song_on_air(server, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(server.spotify_prefetcher, 'submit', lambda *args: submitted.append(args))
+    monkeypatch.setattr(server.presenter_resolver, 'on_song', lambda song: None)
+    monkeypatch.setattr(server.now_playing_doc, 'on_song', lambda song: setattr(server.now_playing_doc, 'song', song))
+    monkeypatch.setattr(server.now_playing_doc, 'song', None)
+
+    monkeypatch.setattr(server.leader_election, 'is_leader', True)
+    server._on_song('The Weeknd - Blinding Lights')
+    # Repeats of the same song and unparseable titles submit nothing
+    server._on_song('The Weeknd - Blinding Lights')
+    server._on_song('TruckSimFM Live')
+    assert submitted == [('The Weeknd', 'Blinding Lights', PRIORITY_NOW_PLAYING)]
+
+    # Followers leave prefetching to the leader
+    monkeypatch.setattr(server.leader_election, 'is_leader', False)
+    server._on_song('Dua Lipa - Levitating')
+    assert len(submitted) == 1
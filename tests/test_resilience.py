@@ -0,0 +1,156 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpen, RateLimited, TokenBucket, parse_retry_after
+from spotify_token import SpotifyTokenManager
+
+
+def test_bucket_grants_the_burst_then_rejects():
+    async def run():
+        bucket = TokenBucket(rate=10, capacity=2)
+        await bucket.acquire(max_wait=0)
+        await bucket.acquire(max_wait=0)
+        with pytest.raises(RateLimited):
+            await bucket.acquire(max_wait=0)
+        started = time.monotonic()
+        await bucket.acquire(max_wait=0.2)
+        return time.monotonic() - started
+
+    assert 0.05 < asyncio.run(run()) < 0.2
+
+
+def test_bucket_bounds_the_total_wait():
+    async def run():
+        bucket = TokenBucket(rate=10, capacity=1)
+        started = time.monotonic()
+
+        async def call():
+            try:
+                await bucket.acquire(max_wait=0.5)
+            except RateLimited:
+                return None
+            return time.monotonic() - started
+
+        return await asyncio.gather(*(call() for _ in range(50)))
+
+    waits = asyncio.run(run())
+    granted = [w for w in waits if w is not None]
+    # The burst token plus one every 0.1s for 0.5s; the rest are rejected at once
+    assert len(granted) == 6
+    assert max(granted) < 0.6
+    assert waits.count(None) == 44
+
+
+def test_bucket_refunds_a_cancelled_reservation():
+    async def run():
+        bucket = TokenBucket(rate=10, capacity=1)
+        await bucket.acquire(max_wait=0)
+        waiter = asyncio.create_task(bucket.acquire(max_wait=1))
+        await asyncio.sleep(0.01)
+        assert bucket.snapshot()['queued'] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return bucket.snapshot()['queued']
+
+    assert asyncio.run(run()) == 0
+
+
+def test_bucket_pause():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=10)
+        bucket.pause(0.3)
+        with pytest.raises(RateLimited):
+            await bucket.acquire(max_wait=0.1)
+        started = time.monotonic()
+        await bucket.acquire(max_wait=1)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('5') == 5
+    assert parse_retry_after(' 2.5 ') == 2.5
+    assert parse_retry_after('-3') == 0
+
+
+def test_parse_retry_after_http_date():
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0
+
+
+def test_parse_retry_after_garbage():
+    assert parse_retry_after(None) == 1.0
+    assert parse_retry_after('') == 1.0
+    assert parse_retry_after('soon') == 1.0
+    assert parse_retry_after('soon', default=7) == 7
+
+
+def test_breaker_transitions():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.1)
+    assert breaker.state == 'half_open'
+    # One trial call at a time
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    time.sleep(0.1)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.snapshot() == {'state': 'closed', 'consecutive_failures': 0, 'retry_in': 0.0}
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_breaker_release_frees_a_cancelled_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.05)
+    assert breaker.allow()
+    # The trial was cancelled before it could report: let the next caller try
+    breaker.release()
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+def test_token_requests_go_through_the_breaker(upstream_client):
+    tokens = SpotifyTokenManager()
+    # Nothing listens on the discard port: every request fails to connect
+    tokens.accounts_url = 'http://127.0.0.1:9'
+    tokens.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(Exception) as error:
+                await tokens.refresh()
+            assert not isinstance(error.value, CircuitOpen)
+        # Open now: fail fast without another request
+        with pytest.raises(CircuitOpen):
+            await tokens.refresh()
+        await upstream_client.aclose()
+
+    asyncio.run(run())
+    assert tokens.breaker.state == 'open'
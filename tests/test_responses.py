@@ -0,0 +1,115 @@
+import asyncio
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+import responses
+from responses import ConditionalJSON, accepted_encodings
+
+PAYLOAD = {'success': True, 'data': [{'show_name': f'Show {i}', 'description': 'x' * 40} for i in range(50)]}
+
+
+def request(**headers):
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/api/schedule',
+        'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_accepted_encodings():
+    assert accepted_encodings('gzip, deflate, br') == {'gzip': 1.0, 'deflate': 1.0, 'br': 1.0}
+    assert accepted_encodings('br;q=0, gzip; q=0.5, *;q=0.1') == {'br': 0.0, 'gzip': 0.5, '*': 0.1}
+    assert accepted_encodings('gzip;q=nope') == {'gzip': 0.0}
+    assert accepted_encodings('') == {}
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0.5, br;q=0.8', 'br'),
+    ('gzip;q=0.9, br;q=0.8', 'gzip'),
+    ('*', 'br'),
+    ('*;q=0, gzip', 'gzip'),
+    ('identity', 'identity'),
+    ('gzip;q=0', 'identity'),
+    ('', 'identity'),
+])
+def test_pick_encoding_honours_q_values(header, expected):
+    assert ConditionalJSON._pick_encoding(request(accept_encoding=header)) == expected
+
+
+def test_etag_differs_per_encoding():
+    renderer = ConditionalJSON()
+    plain = renderer.render(request(), PAYLOAD)
+    gzipped = renderer.render(request(accept_encoding='gzip'), PAYLOAD)
+    assert plain.headers['etag'] != gzipped.headers['etag']
+    assert gzipped.headers['etag'] == plain.headers['etag'][:-1] + '-gzip"'
+    assert gzip.decompress(gzipped.body) == plain.body
+
+    # Revalidation matches the tag of the representation being negotiated
+    assert renderer.render(
+        request(accept_encoding='gzip', if_none_match=gzipped.headers['etag']), PAYLOAD
+    ).status_code == 304
+    assert renderer.render(
+        request(accept_encoding='gzip', if_none_match=plain.headers['etag']), PAYLOAD
+    ).status_code == 200
+
+
+def test_small_bodies_are_not_compressed():
+    response = ConditionalJSON().render(request(accept_encoding='gzip'), {'success': True, 'data': 'x'})
+    assert 'content-encoding' not in response.headers
+    assert '-gzip' not in response.headers['etag']
+
+
+def test_memo_serializes_once(monkeypatch):
+    calls = []
+    real_dumps = responses.dumps
+    monkeypatch.setattr(responses, 'dumps', lambda payload: calls.append(1) or real_dumps(payload))
+
+    renderer = ConditionalJSON()
+    memo = {}
+    first = renderer.render(request(accept_encoding='gzip'), PAYLOAD, memo)
+    second = renderer.render(request(accept_encoding='gzip'), PAYLOAD, memo)
+    revalidated = renderer.render(request(accept_encoding='gzip', if_none_match=first.headers['etag']), PAYLOAD, memo)
+    assert len(calls) == 1
+    assert first.body == second.body
+    assert revalidated.status_code == 304
+
+
+def test_schedule_is_serialized_once_per_cache_entry(server, monkeypatch):
+    import httpx
+
+    calls = []
+    real_dumps = responses.dumps
+    monkeypatch.setattr(responses, 'dumps', lambda payload: calls.append(1) or real_dumps(payload))
+
+    async def get(client, **headers):
+        return await client.get('/api/schedule', headers=headers)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            server.upstream_cache.put('schedule', PAYLOAD['data'])
+            first = await get(client)
+            gzipped = await get(client, **{'Accept-Encoding': 'gzip'})
+            again = await get(client, **{'If-None-Match': first.headers['etag']})
+            serialized = len(calls)
+
+            # A refreshed schedule is a new entry: serialized again, with a new tag
+            server.upstream_cache.put('schedule', PAYLOAD['data'][:10])
+            refreshed = await get(client)
+            return first, gzipped, again, serialized, refreshed
+
+    try:
+        first, gzipped, again, serialized, refreshed = asyncio.run(run())
+    finally:
+        server.upstream_cache.invalidate('schedule')
+    assert serialized == 1
+    assert first.json()['data'] == PAYLOAD['data']
+    assert gzipped.headers['etag'] != first.headers['etag']
+    assert again.status_code == 304
+    assert len(calls) == 2
+    assert refreshed.headers['etag'] != first.headers['etag']
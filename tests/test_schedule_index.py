@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+
+from schedule_index import ScheduleIndex
+
+# Monday
+WEEK = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+
+def iso(moment: datetime) -> str:
+    return moment.isoformat().replace('+00:00', '.000Z')
+
+
+def show(name, start, hours, presenter='DJ Bob', permanent=True, perm_end=None, excluded=()):
+    return {
+        'id': name,
+        'show_name': name,
+        'description': '',
+        'start_time': iso(start),
+        'end_time': iso(start + timedelta(hours=hours)),
+        'permanent': permanent,
+        'perm_end': iso(perm_end) if perm_end else None,
+        'excluded_dates': list(excluded),
+        'users_permissions_user': {'username': presenter, 'profile_photo': {'url': '/uploads/dj.png'}}
+        if presenter else None,
+    }
+
+
+def at(days, hours, minutes=0):
+    """A moment two weeks after the shows were first scheduled"""
+    return WEEK + timedelta(weeks=2, days=days, hours=hours, minutes=minutes)
+
+
+def names(occurrences):
+    return [o['show_name'] for o in occurrences]
+
+
+def test_live_weekly_show_recurs():
+    index = ScheduleIndex([show('Breakfast', WEEK + timedelta(hours=6), 4)])
+    live = index.live(at(0, 7))
+    assert names(live) == ['Breakfast']
+    assert live[0]['start_time'] == '2026-01-19T06:00:00Z'
+    assert live[0]['end_time'] == '2026-01-19T10:00:00Z'
+    assert live[0]['photo_url'] == 'https://trucksim.fm/uploads/dj.png'
+    assert index.live(at(0, 5, 59)) == []
+    assert index.live(at(0, 10)) == []
+    assert index.live(at(1, 7)) == []
+
+
+def test_live_past_midnight_and_week_end():
+    # Sunday 22:00 - Monday 02:00 wraps around the end of the minute-of-week axis
+    index = ScheduleIndex([show('Late', WEEK + timedelta(days=6, hours=22), 4)])
+    live = index.live(at(0, 1))
+    assert names(live) == ['Late']
+    assert live[0]['start_time'] == '2026-01-18T22:00:00Z'
+    assert names(index.live(at(-1, 23))) == ['Late']
+    assert index.live(at(0, 2)) == []
+
+
+def test_live_respects_excluded_dates_and_perm_end():
+    index = ScheduleIndex([
+        show('Excluded', WEEK + timedelta(hours=6), 4, excluded=['2026-01-19']),
+        show('Ended', WEEK + timedelta(hours=12), 4, perm_end=at(-1, 0)),
+    ])
+    assert index.live(at(0, 7)) == []
+    assert names(index.live(at(-7, 7))) == ['Excluded']
+    assert index.live(at(0, 13)) == []
+    assert names(index.live(at(-7, 13))) == ['Ended']
+
+
+def test_live_priority_and_now():
+    index = ScheduleIndex([
+        show('Weekly', WEEK + timedelta(hours=6), 4),
+        show('Special', at(0, 7), 1, permanent=False),
+        show('Automation', WEEK + timedelta(hours=6), 4, presenter=None),
+    ])
+    # One-time shows outrank weekly ones
+    assert names(index.live(at(0, 7, 30))) == ['Special', 'Weekly', 'Automation']
+    assert index.now(at(0, 7, 30))['show_name'] == 'Special'
+    assert names(index.live(at(0, 8))) == ['Weekly', 'Automation']
+
+    unattended = ScheduleIndex([show('Automation', WEEK + timedelta(hours=6), 4, presenter=None)])
+    assert names(unattended.live(at(0, 7))) == ['Automation']
+    assert unattended.now(at(0, 7)) is None
+
+
+def test_live_ignores_invalid_items():
+    broken = show('Broken', WEEK, 1)
+    broken['start_time'] = 'not a date'
+    index = ScheduleIndex([broken, show('Fine', WEEK + timedelta(hours=6), 4)])
+    assert names(index.live(at(0, 7))) == ['Fine']
+
+
+def test_upcoming_wraps_weeks_in_order():
+    index = ScheduleIndex([
+        show('Monday', WEEK + timedelta(hours=6), 2),
+        show('Wednesday', WEEK + timedelta(days=2, hours=6), 2),
+    ])
+    upcoming = index.upcoming(3, at(0, 12))
+    assert [o['start_time'] for o in upcoming] == [
+        '2026-01-21T06:00:00Z', '2026-01-26T06:00:00Z', '2026-01-28T06:00:00Z',
+    ]
+    # A show already on air is not upcoming
+    assert names(index.upcoming(1, at(0, 7))) == ['Wednesday']
+
+
+def test_upcoming_skips_excluded_and_ended_occurrences():
+    index = ScheduleIndex([
+        show('Monday', WEEK + timedelta(hours=6), 2, excluded=['2026-01-26']),
+        show('Wednesday', WEEK + timedelta(days=2, hours=6), 2, perm_end=at(3, 0)),
+    ])
+    upcoming = index.upcoming(2, at(0, 12))
+    assert [(o['show_name'], o['start_time']) for o in upcoming] == [
+        ('Wednesday', '2026-01-21T06:00:00Z'), ('Monday', '2026-02-02T06:00:00Z'),
+    ]
+
+
+def test_upcoming_merges_one_time_shows():
+    index = ScheduleIndex([
+        show('Monday', WEEK + timedelta(hours=6), 2),
+        show('Special', at(1, 20), 1, permanent=False),
+        show('Past special', at(-1, 20), 1, permanent=False),
+    ])
+    assert names(index.upcoming(3, at(0, 12))) == ['Special', 'Monday', 'Monday']
+    assert index.upcoming(0, at(0, 12)) == []
+    assert ScheduleIndex().upcoming(5, at(0, 12)) == []
@@ -0,0 +1,49 @@
+import asyncio
+
+from spotify_service import SpotifyService
+
+
+def make_service(monkeypatch, mode=None, delay=0.05):
+    if mode is None:
+        monkeypatch.delenv('SPOTIFY_SEARCH_MODE', raising=False)
+    else:
+        monkeypatch.setenv('SPOTIFY_SEARCH_MODE', mode)
+    monkeypatch.setenv('SPOTIFY_HEDGE_DELAY', str(delay))
+    service = SpotifyService()
+    started = []
+
+    async def token():
+        return 'tok'
+
+    async def attempt(token, name, query, artist, title):
+        started.append(name)
+        # The strict search is slow and misses; every later strategy matches
+        if name == 'strict search':
+            await asyncio.sleep(0.2)
+            return None
+        return {'name': name}
+
+    service._get_access_token = token
+    service._attempt = attempt
+    return service, started
+
+
+def test_default_mode_runs_one_strategy_at_a_time(monkeypatch):
+    service, started = make_service(monkeypatch)
+    assert service.search_mode == 'sequential'
+
+    result = asyncio.run(service._run_strategies('Calvin Harris', 'Blessings'))
+
+    assert result == {'name': 'unquoted search'}
+    assert started == ['strict search', 'unquoted search']
+
+
+def test_hedged_mode_is_opt_in(monkeypatch):
+    service, started = make_service(monkeypatch, mode='hedged')
+
+    result = asyncio.run(service._run_strategies('Calvin Harris', 'Blessings'))
+
+    # The winner is still the highest-priority match, but the slow strict
+    # search let the remaining strategies start before it finished
+    assert result == {'name': 'unquoted search'}
+    assert len(started) > 2
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime
+
+from status_store import StatusCheckStore
+
+
+def ttl_indexes(collection):
+    async def read():
+        return {
+            name: info['expireAfterSeconds']
+            for name, info in (await collection.index_information()).items()
+            if 'expireAfterSeconds' in info
+        }
+    return asyncio.run(read())
+
+
+def test_retention_is_opt_in(db, monkeypatch):
+    monkeypatch.delenv('STATUS_CHECK_TTL_DAYS', raising=False)
+    store = StatusCheckStore(db.status_checks)
+    asyncio.run(store.ensure_indexes())
+    assert ttl_indexes(db.status_checks) == {}
+
+
+def test_disabling_retention_drops_the_ttl_index(db, monkeypatch):
+    monkeypatch.setenv('STATUS_CHECK_TTL_DAYS', '30')
+    asyncio.run(StatusCheckStore(db.status_checks).ensure_indexes())
+    assert list(ttl_indexes(db.status_checks).values()) == [30 * 86400]
+
+    monkeypatch.setenv('STATUS_CHECK_TTL_DAYS', '0')
+    asyncio.run(StatusCheckStore(db.status_checks).ensure_indexes())
+    assert ttl_indexes(db.status_checks) == {}
+
+
+def test_unbuffered_writes_are_readable_immediately(db, monkeypatch):
+    monkeypatch.delenv('STATUS_CHECK_BUFFER', raising=False)
+    store = StatusCheckStore(db.status_checks)
+
+    async def run():
+        await store.add({'id': 'a', 'client_name': 'app', 'timestamp': datetime(2026, 1, 1)})
+        return await db.status_checks.count_documents({})
+    assert asyncio.run(run()) == 1
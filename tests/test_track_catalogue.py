@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from track_catalogue import TrackCatalogue, catalogue_form, word_typos
+
+KNOWN = [
+    ('The Weeknd', 'Blinding Lights'),
+    ('Dua Lipa', 'Levitating'),
+    ('Dua Lipa', 'Levitating - Remix'),
+    ('Fleetwood Mac', 'Go Your Own Way'),
+    ('Bonnie Tyler', 'Total Eclipse of the Heart'),
+    ('Whitney Houston', 'I Wanna Dance with Somebody (Who Loves Me)'),
+    ('Kygo, Whitney Houston', 'Higher Love'),
+    ('Queen', "Don't Stop Me Now"),
+    ('Coldplay', 'Paradise'),
+    ('Avicii', 'The Nights'),
+    ('Beyoncé', 'Halo'),
+]
+
+
+@pytest.fixture
+def catalogue(db):
+    catalogue = TrackCatalogue(db.track_catalogue)
+
+    async def fill():
+        for artist, title in KNOWN:
+            await catalogue.add(artist, title, {'artist': artist, 'title': title})
+    asyncio.run(fill())
+    return catalogue
+
+
+def matched_title(catalogue, artist, title):
+    result = catalogue.match(artist, title)
+    return result and result[0]['title']
+
+
+@pytest.mark.parametrize('artist, title, expected', [
+    ('The Weeknd', 'Blindng Lights', 'Blinding Lights'),
+    ('Dua Lipa', 'Levitatin', 'Levitating'),
+    ('Fleetwood Mac', 'Go You Own Way', 'Go Your Own Way'),
+    ('Bonnie Tyler', 'Total Eclipse of the Hart', 'Total Eclipse of the Heart'),
+    ('Whitney Houston', 'I Wana Dance with Somebody', 'I Wanna Dance with Somebody (Who Loves Me)'),
+    ('The Weeknd', 'Blinding Lights - Radio Edit', 'Blinding Lights'),
+    ('Kygo ft. Whitney Houston', 'Higher Love [Radio Edit]', 'Higher Love'),
+    ('Queen', 'Dont Stop Me Now', "Don't Stop Me Now"),
+    ('dua lipa', 'LEVITATING (Remix)', 'Levitating - Remix'),
+])
+def test_matches_spelling_variants(catalogue, artist, title, expected):
+    assert matched_title(catalogue, artist, title) == expected
+
+
+@pytest.mark.parametrize('artist, title', [
+    # The artist is known, the song is not
+    ('Coldplay', 'Paradise City'),
+    ('Avicii', 'The Night'),
+    ('Beyoncé', 'Hello'),
+    ('Fleetwood Mac', 'Go Your Own Way Home'),
+    # Two misspelled words in a short title is a different title
+    ('The Weeknd', 'Blindng Lihgts'),
+    ('Nobody', 'Unknown Song'),
+])
+def test_rejects_different_songs(catalogue, artist, title):
+    assert catalogue.match(artist, title) is None
+
+
+def test_does_not_substitute_another_version(catalogue):
+    assert matched_title(catalogue, 'Dua Lipa', 'Levitating') == 'Levitating'
+    assert matched_title(catalogue, 'Dua Lipa', 'Levitating (Live)') is None
+
+
+def test_catalogue_form():
+    assert catalogue_form('Higher Love (feat. Whitney Houston)') == 'higher love'
+    assert catalogue_form('Dreams - 2004 Remaster') == 'dreams'
+    assert catalogue_form("Don't Stop Me Now") == 'dont stop me now'
+
+
+def test_word_typos():
+    assert word_typos({'blindng', 'lights'}, {'blinding', 'lights'}) == 1
+    assert word_typos({'night'}, {'nights'}) is None
+    assert word_typos({'paradise', 'city'}, {'paradise'}) is None
+    # Short words must match exactly
+    assert word_typos({'on'}, {'in'}) is None
+
+
+def test_reload_and_expiry(catalogue, db):
+    reloaded = TrackCatalogue(db.track_catalogue)
+    asyncio.run(reloaded.load())
+    assert len(reloaded.tracks) == len(KNOWN)
+    assert matched_title(reloaded, 'The Weeknd', 'Blindng Lights') == 'Blinding Lights'
+
+    track_id = TrackCatalogue.track_id({'artist': 'The Weeknd', 'title': 'Blinding Lights'})
+    track, _ = reloaded.tracks[track_id]
+    reloaded.tracks[track_id] = (track, time.time() - 1)
+    assert reloaded.match('The Weeknd', 'Blinding Lights') is None
+    reloaded.prune()
+    assert track_id not in reloaded.tracks
+    assert matched_title(reloaded, 'Dua Lipa', 'Levitatin') == 'Levitating'
+
+
+def test_service_keeps_catalogue_hits_in_memory(catalogue, db):
+    from spotify_service import SpotifyService
+    from track_cache import TrackCache
+
+    cache = TrackCache(db.spotify_tracks)
+    service = SpotifyService(cache=cache, catalogue=catalogue)
+
+    async def lookups():
+        first = await service._lookup('The Weeknd', 'Blindng Lights')
+        second = await service._lookup('The Weeknd', 'Blindng Lights')
+        return first, second
+    first, second = asyncio.run(lookups())
+    assert first['title'] == second['title'] == 'Blinding Lights'
+    # The repeat is answered by the LRU: no second Mongo lookup or catalogue search
+    assert cache.stats == {'miss': 1, 'memory': 1}
+    assert catalogue.stats['hit'] == 1
@@ -0,0 +1,64 @@
+from track_matcher import MATCH_THRESHOLD, best_candidate, score_candidate
+
+
+def track(name, *artists, track_id=None):
+    return {'id': track_id or name, 'name': name, 'artists': [{'name': a} for a in artists]}
+
+
+def test_exact_match_scores_highest():
+    exact = track('Blinding Lights', 'The Weeknd')
+    other = track('Blinding Lights', 'Cover Band')
+    found, score = best_candidate([other, exact], 'The Weeknd', 'Blinding Lights')
+    assert found is exact
+    assert score == score_candidate(exact, 'The Weeknd', 'Blinding Lights')
+    assert score > score_candidate(other, 'The Weeknd', 'Blinding Lights')
+
+
+def test_prefers_original_over_unrequested_versions():
+    tracks = [
+        track('Levitating - Remix', 'Dua Lipa'),
+        track('Levitating (Live)', 'Dua Lipa'),
+        track('Levitating', 'Dua Lipa'),
+    ]
+    found, _ = best_candidate(tracks, 'Dua Lipa', 'Levitating')
+    assert found['name'] == 'Levitating'
+
+
+def test_keeps_requested_version():
+    tracks = [track('Levitating', 'Dua Lipa'), track('Levitating - Remix', 'Dua Lipa')]
+    found, _ = best_candidate(tracks, 'Dua Lipa', 'Levitating (Remix)')
+    assert found['name'] == 'Levitating - Remix'
+
+
+def test_ignores_featured_artists_and_brackets():
+    tracks = [track('Higher Love', 'Kygo', 'Whitney Houston')]
+    found, _ = best_candidate(tracks, 'Kygo feat. Whitney Houston', 'Higher Love')
+    assert found is tracks[0]
+    tracks = [track('Sweet Dreams (Are Made of This) - Remastered', 'Eurythmics')]
+    assert best_candidate(tracks, 'Eurythmics', 'Sweet Dreams') is not None
+
+
+def test_rejects_a_different_song_by_the_same_artist():
+    tracks = [track('Bohemian Rhapsody', 'Queen'), track('Under Pressure', 'Queen', 'David Bowie')]
+    assert best_candidate(tracks, 'Queen', "Don't Stop Me Now") is None
+
+
+def test_rejects_below_threshold():
+    tracks = [track('Blessings', 'Someone Else')]
+    result = best_candidate(tracks, 'Calvin Harris', 'Blessings')
+    score = score_candidate(tracks[0], 'Calvin Harris', 'Blessings')
+    assert result == (tracks[0], score)
+    assert score >= MATCH_THRESHOLD
+    assert best_candidate(tracks, 'Calvin Harris', 'Blessings', threshold=score + 0.01) is None
+
+
+def test_ties_keep_spotify_order():
+    first = track('One More Time', 'Daft Punk', track_id='first')
+    second = track('One More Time', 'Daft Punk', track_id='second')
+    found, _ = best_candidate([first, second], 'Daft Punk', 'One More Time')
+    assert found['id'] == 'first'
+
+
+def test_empty_candidates():
+    assert best_candidate([], 'Queen', 'Bohemian Rhapsody') is None
+    assert best_candidate([track('', 'Queen')], 'Queen', 'Bohemian Rhapsody') is None
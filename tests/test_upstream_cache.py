@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from upstream_cache import UpstreamCache
+
+
+class Fetcher:
+    """Counts calls; each returns the next version after `delay` seconds"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        version = self.calls
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return f'v{version}'
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = UpstreamCache()
+    fetch = Fetcher()
+
+    async def run():
+        return await asyncio.gather(*(cache.get('schedule', fetch, ttl=60) for _ in range(50)))
+
+    assert asyncio.run(run()) == ['v1'] * 50
+    assert fetch.calls == 1
+    assert cache.stats[('schedule', 'miss')] == 50
+
+
+def test_fresh_values_are_served_from_memory():
+    cache = UpstreamCache()
+    fetch = Fetcher()
+
+    async def run():
+        await cache.get('current-song', fetch, ttl=60)
+        return await cache.get('current-song', fetch, ttl=60)
+
+    assert asyncio.run(run()) == 'v1'
+    assert fetch.calls == 1
+    assert cache.stats[('current-song', 'hit')] == 1
+
+
+def test_stale_value_is_served_while_one_refresh_runs():
+    cache = UpstreamCache()
+    fetch = Fetcher(delay=0.1)
+
+    async def run():
+        await cache.get('schedule', fetch, ttl=0.05, stale_ttl=10)
+        await asyncio.sleep(0.06)
+        # Stale: answered at once with the old value, refreshed once in the background
+        stale = await asyncio.wait_for(
+            asyncio.gather(*(cache.get('schedule', fetch, ttl=0.05, stale_ttl=10) for _ in range(20))), 0.05
+        )
+        await asyncio.sleep(0.15)
+        return stale, cache.peek('schedule')
+
+    stale, refreshed = asyncio.run(run())
+    assert stale == ['v1'] * 20
+    assert refreshed == 'v2'
+    assert fetch.calls == 2
+
+
+def test_failed_fetches_are_not_cached():
+    cache = UpstreamCache()
+    fetch = Fetcher()
+    fetch.fail = True
+
+    async def run():
+        results = await asyncio.gather(*(cache.get('schedule', fetch, ttl=60) for _ in range(5)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.peek('schedule') is None
+        fetch.fail = False
+        return await cache.get('schedule', fetch, ttl=60)
+
+    assert asyncio.run(run()) == 'v2'
+    assert fetch.calls == 2
+
+
+def test_last_good_value_survives_an_upstream_error():
+    cache = UpstreamCache()
+    fetch = Fetcher()
+
+    async def run():
+        await cache.get('schedule', fetch, ttl=0.01)
+        await asyncio.sleep(0.02)
+        fetch.fail = True
+        return await cache.get('schedule', fetch, ttl=0.01)
+
+    assert asyncio.run(run()) == 'v1'
+
+
+def test_a_cancelled_caller_does_not_cancel_the_fetch():
+    cache = UpstreamCache()
+    fetch = Fetcher(delay=0.1)
+
+    async def run():
+        first = asyncio.create_task(cache.get('schedule', fetch, ttl=60))
+        second = asyncio.create_task(cache.get('schedule', fetch, ttl=60))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 'v1'
+    assert fetch.calls == 1